@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import itertools
+import statistics
+import subprocess
+
+from productivity_tester import run_performance_test, build_params, expected_increments
+
+logger = logging.getLogger("benchmark_matrix")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_at REAL NOT NULL,
+    git_commit TEXT NOT NULL,
+    host TEXT NOT NULL,
+    cell TEXT NOT NULL,
+    counter_type TEXT NOT NULL,
+    method TEXT,
+    write_concern TEXT,
+    n_clients INTEGER NOT NULL,
+    n_calls_per_client INTEGER NOT NULL,
+    repetition INTEGER NOT NULL,
+    rps REAL NOT NULL,
+    p50_ms REAL NOT NULL,
+    p99_ms REAL NOT NULL,
+    count_increase INTEGER NOT NULL,
+    expected_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lookup ON results (host, git_commit, cell);
+CREATE TABLE IF NOT EXISTS baselines (
+    host TEXT NOT NULL,
+    cell TEXT NOT NULL,
+    git_commit TEXT NOT NULL,
+    PRIMARY KEY (host, cell)
+);
+"""
+
+
+def get_git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        commit = result.stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def open_store(path: str):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _as_list(value, default=None):
+    if value is None:
+        return [default]
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def expand_matrix(spec: dict):
+    defaults = spec.get("defaults", {})
+    cells = []
+    for entry in spec["runs"]:
+        entry = {**defaults, **entry}
+        for method, write_concern, n_clients in itertools.product(
+            _as_list(entry.get("methods")),
+            _as_list(entry.get("write_concerns")),
+            _as_list(entry.get("n_clients"), 1),
+        ):
+            cells.append({
+                "counter_type": entry["counter_type"],
+                "method": method,
+                "write_concern": write_concern,
+                "n_clients": n_clients,
+                "n_calls_per_client": entry.get("n_calls_per_client", 1000),
+                "repetitions": entry.get("repetitions", 3),
+                "options": entry.get("options", {}),
+            })
+    return cells
+
+
+def cell_key(cell: dict) -> str:
+    # Options are part of the key, in a canonical order, so that cells that
+    # differ only in engine, processes, batch size and so on never share
+    # samples or a baseline.
+    return "|".join(str(part) for part in (
+        cell["counter_type"],
+        cell["method"] or "default",
+        cell["write_concern"] if cell["write_concern"] is not None else "default",
+        cell["n_clients"],
+        cell["n_calls_per_client"],
+        json.dumps(cell["options"], sort_keys=True, separators=(",", ":")),
+    ))
+
+
+# Cell options that configure the backend client go to build_params; the
+# others are arguments of run_performance_test.
+BACKEND_OPTIONS = ("do_retries", "connections", "latency_ms", "lock_hold_ms", "pipeline_depth", "hedge_after_ms")
+
+
+def counts_checked(cell: dict) -> bool:
+    # The null backend keeps no count, and the memory backend's count lives in
+    # the process that runs the clients, so worker processes' increments are
+    # not in the final count.
+    if cell["counter_type"] == "null":
+        return False
+    return not (cell["counter_type"] == "memory" and cell["options"].get("processes", 1) > 1)
+
+
+def run_cell(cell: dict):
+    options = dict(cell["options"])
+    counter_host = options.pop("counter_host", None) or os.getenv('COUNTER_HOST', 'localhost')
+    counter_port = options.pop("counter_port", None) or int(os.getenv('COUNTER_PORT', '8080'))
+    backend_options = {name: options.pop(name) for name in BACKEND_OPTIONS if name in options}
+    samples = []
+    for repetition in range(cell["repetitions"]):
+        params = build_params(
+            cell["counter_type"],
+            counter_host=counter_host,
+            counter_port=counter_port,
+            method=cell["method"],
+            write_concern=cell["write_concern"],
+            engine=options.get("engine", "thread"),
+            **backend_options,
+        )
+        count_increase, _, requests_per_second, _, stats = run_performance_test(
+            counter_type=cell["counter_type"],
+            n_clients=cell["n_clients"],
+            n_calls_per_client=cell["n_calls_per_client"],
+            params=params,
+            **options,
+        )
+        latency = stats["latency"]
+        samples.append({
+            "repetition": repetition,
+            "rps": stats["achieved_rps"] if stats.get("measured_time") else requests_per_second,
+            "p50_ms": latency.percentile(50.0) / 1e6,
+            "p99_ms": latency.percentile(99.0) / 1e6,
+            "count_increase": count_increase,
+            "expected_count": expected_increments(cell["n_clients"], cell["n_calls_per_client"], options.get("read_ratio", 0.0), options.get("batch_size", 1)),
+        })
+    return samples
+
+
+def store_samples(conn, git_commit: str, host: str, cell: dict, samples):
+    run_at = time.time()
+    conn.executemany(
+        "INSERT INTO results (run_at, git_commit, host, cell, counter_type, method, write_concern, "
+        "n_clients, n_calls_per_client, repetition, rps, p50_ms, p99_ms, count_increase, expected_count) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                run_at, git_commit, host, cell_key(cell), cell["counter_type"], cell["method"],
+                None if cell["write_concern"] is None else str(cell["write_concern"]),
+                cell["n_clients"], cell["n_calls_per_client"], sample["repetition"], sample["rps"],
+                sample["p50_ms"], sample["p99_ms"], sample["count_increase"], sample["expected_count"],
+            )
+            for sample in samples
+        ],
+    )
+    conn.commit()
+
+
+def load_medians(conn, host: str, git_commit: str, cell: str):
+    rows = conn.execute(
+        "SELECT rps, p99_ms FROM results WHERE host = ? AND git_commit = ? AND cell = ?",
+        (host, git_commit, cell),
+    ).fetchall()
+    if not rows:
+        return None
+    return statistics.median(r[0] for r in rows), statistics.median(r[1] for r in rows)
+
+
+def get_baseline_commit(conn, host: str, cell: str):
+    row = conn.execute(
+        "SELECT git_commit FROM baselines WHERE host = ? AND cell = ?",
+        (host, cell),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def set_baseline_commit(conn, host: str, cell: str, git_commit: str):
+    conn.execute(
+        "INSERT INTO baselines (host, cell, git_commit) VALUES (?, ?, ?) "
+        "ON CONFLICT (host, cell) DO UPDATE SET git_commit = excluded.git_commit",
+        (host, cell, git_commit),
+    )
+    conn.commit()
+
+
+def compare(current, baseline, rps_threshold: float, p99_threshold: float):
+    rps, p99 = current
+    base_rps, base_p99 = baseline
+    problems = []
+    if base_rps > 0 and rps < base_rps * (1 - rps_threshold):
+        problems.append(f"median RPS {rps:.2f} < baseline {base_rps:.2f} (-{(1 - rps / base_rps) * 100:.1f}%)")
+    if base_p99 > 0 and p99 > base_p99 * (1 + p99_threshold):
+        problems.append(f"median p99 {p99:.3f}ms > baseline {base_p99:.3f}ms (+{(p99 / base_p99 - 1) * 100:.1f}%)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run a backend x method x n_clients benchmark matrix and gate on regressions',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+  Examples:
+  # Run the matrix and record it as the baseline for this host
+  python benchmark_matrix.py --spec benchmark_matrix.example.json --set-baseline
+
+  # Run the matrix and fail if median RPS drops by more than 10% or p99 grows by more than 25%
+  python benchmark_matrix.py --spec benchmark_matrix.example.json --rps-threshold 0.10 --p99-threshold 0.25
+        """
+    )
+    parser.add_argument('--spec', type=str, required=True, help='JSON matrix spec')
+    parser.add_argument('--db', type=str, default='benchmark_results.sqlite', help='SQLite result store (default: benchmark_results.sqlite)')
+    parser.add_argument('--baseline', type=str, default=None, help='Git commit to compare against (default: stored baseline per cell)')
+    parser.add_argument('--set-baseline', action='store_true', help='Record this run as the baseline for this host')
+    parser.add_argument('--rps-threshold', type=float, default=0.10, help='Allowed relative drop in median RPS (default: 0.10)')
+    parser.add_argument('--p99-threshold', type=float, default=0.20, help='Allowed relative growth in median p99 latency (default: 0.20)')
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+
+    git_commit = get_git_commit()
+    host = socket.gethostname()
+    conn = open_store(args.db)
+    logger.info(f"Benchmark matrix at commit {git_commit} on {host}, storing results in {args.db}")
+
+    report = []
+    regressions = 0
+    failures = 0
+    for cell in expand_matrix(spec):
+        key = cell_key(cell)
+        logger.info(f"Running cell {key} ({cell['repetitions']} repetitions)")
+        samples = run_cell(cell)
+        # A run that lost or duplicated increments measured something else:
+        # keep it out of the store and out of the baselines.
+        wrong = [s for s in samples if s["count_increase"] != s["expected_count"]] if counts_checked(cell) else []
+        if wrong:
+            failures += 1
+            problems = [f"repetition {s['repetition']}: count increased by {s['count_increase']}, expected {s['expected_count']}" for s in wrong]
+            logger.error(f"Cell {key} failed: {'; '.join(problems)}")
+            report.append((key, None, None, None, problems))
+            continue
+        store_samples(conn, git_commit, host, cell, samples)
+        current = (statistics.median(s["rps"] for s in samples), statistics.median(s["p99_ms"] for s in samples))
+
+        baseline_commit = args.baseline or get_baseline_commit(conn, host, key)
+        baseline = None
+        if baseline_commit and baseline_commit != git_commit:
+            baseline = load_medians(conn, host, baseline_commit, key)
+        problems = compare(current, baseline, args.rps_threshold, args.p99_threshold) if baseline else []
+        regressions += bool(problems)
+        report.append((key, current, baseline_commit if baseline else None, baseline, problems))
+
+        if args.set_baseline:
+            set_baseline_commit(conn, host, key, git_commit)
+
+    print("\n" + "="*60)
+    print("BENCHMARK MATRIX RESULTS")
+    print("="*60)
+    for key, current, baseline_commit, baseline, problems in report:
+        if current is None:
+            print(f"{key:<50} FAILED")
+            for problem in problems:
+                print(f"  WRONG COUNT: {problem}")
+            continue
+        rps, p99 = current
+        line = f"{key:<50} RPS {rps:>10.2f}  p99 {p99:>8.3f}ms"
+        if baseline:
+            line += f"  baseline {baseline_commit}: RPS {baseline[0]:.2f} p99 {baseline[1]:.3f}ms"
+        print(line)
+        for problem in problems:
+            print(f"  REGRESSION: {problem}")
+    print("="*60)
+    print(f"{regressions} regressed cell(s), {failures} failed cell(s)")
+
+    conn.close()
+    return 1 if regressions or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
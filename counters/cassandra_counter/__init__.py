@@ -3,6 +3,7 @@ from .cassandra_counter import (
     close_connection,
     init_user_counter_table,
     get_user_counter,
+    get_total_counter,
     increment,
 )
 
@@ -11,5 +12,6 @@ __all__ = [
     "close_connection",
     "init_user_counter_table",
     "get_user_counter",
+    "get_total_counter",
     "increment",
 ]
@@ -83,6 +83,22 @@ def get_user_counter(user_id: str, conn) -> int:
         return 0
 
 
+def get_total_counter(user_ids, conn) -> int:
+    if conn is None:
+        return 0
+    try:
+        _, session, consistency = conn
+        statement = session.prepare(
+            f"SELECT counter FROM {KEYSPACE}.{TABLE_NAME} WHERE user_id IN ?"
+        )
+        statement.consistency_level = consistency
+        rows = session.execute(statement, (list(user_ids),))
+        return sum(int(row.counter) for row in rows if row.counter is not None)
+    except Exception as e:
+        logger.debug("get_total_counter failed: %s", e)
+        return 0
+
+
 def increment(user_id: str, conn) -> int:
     if conn is None:
         return 0
@@ -3,17 +3,27 @@ from .cassandra_counter import (
     close_connection,
     init_user_counter_table,
     get_user_counter,
+    get_total_counter,
     increment,
 )
 
 DEFAULT_USER_ID = "1"
 
 
+def _count(params, key=None):
+    if key is not None:
+        return get_user_counter(key, params.get("connection"))
+    keys = params.get("keys")
+    if keys:
+        return get_total_counter(keys, params.get("connection"))
+    return get_user_counter(DEFAULT_USER_ID, params.get("connection"))
+
+
 def get_functions():
     return {
         "setup": lambda params: get_connection(),
         "shutdown": lambda params: close_connection(params.get("connection")),
         "reset": lambda params: init_user_counter_table(params.get("connection")),
-        "count": lambda params: get_user_counter(DEFAULT_USER_ID, params.get("connection")),
-        "increment": lambda params: increment(DEFAULT_USER_ID, params.get("connection")),
+        "count": _count,
+        "increment": lambda params, key=None: increment(key or DEFAULT_USER_ID, params.get("connection")),
     }
@@ -43,45 +43,50 @@ def _get_map(client):
     return client.get_map(map_name).blocking()
 
 
-def _get_counter_key():
-    return os.getenv(COUNTER_KEY_ENV, DEFAULT_COUNTER_KEY)
+def _get_counter_key(key=None):
+    base = os.getenv(COUNTER_KEY_ENV, DEFAULT_COUNTER_KEY)
+    return f"{base}:{key}" if key is not None else base
 
 
-def _get_atomic_long(client):
+def _get_atomic_long(client, key=None):
     name = os.getenv(ATOMIC_LONG_NAME_ENV, DEFAULT_ATOMIC_LONG_NAME)
+    if key is not None:
+        name = f"{name}-{key}"
     return client.cp_subsystem.get_atomic_long(name).blocking()
 
 
-def get_atomic_long(client):
-    return _get_atomic_long(client)
+def get_atomic_long(client, key=None):
+    return _get_atomic_long(client, key)
 
 
-def reset_counter(client=None, method=None):
+def reset_counter(client=None, method=None, keys=None):
+    keys = keys or [None]
     if method == "atomic":
-        _get_atomic_long(client).set(0)
+        for key in keys:
+            _get_atomic_long(client, key).set(0)
         return True
     else:
         m = _get_map(client)
-        key = _get_counter_key()
-        m.put(key, 0)
+        m.put_all({_get_counter_key(key): 0 for key in keys})
         return True
 
 
-def get_count(client=None, method=None):
+def get_count(client=None, method=None, keys=None):
+    total = 0
     if method == "atomic":
-        return _get_atomic_long(client).get()
+        for key in keys or [None]:
+            total += _get_atomic_long(client, key).get()
+        return total
     else:
         m = _get_map(client)
-        key = _get_counter_key()
-        value = m.get(key)
-        if value is None:
-            value = 0
-        return value
+        for value in m.get_all([_get_counter_key(key) for key in keys or [None]]).values():
+            total += value or 0
+        return total
 
 
-def increment_no_lock(client=None, method=None):
+def increment_no_lock(client=None, method=None, key=None):
     m = _get_map(client)
-    key = _get_counter_key()
+    key = _get_counter_key(key)
     value = m.get(key)
     if value is None:
         value = 0
@@ -90,9 +95,9 @@ def increment_no_lock(client=None, method=None):
     return new_value
 
 
-def increment_pessimistic(client=None, method=None):
+def increment_pessimistic(client=None, method=None, key=None):
     m = _get_map(client)
-    key = _get_counter_key()
+    key = _get_counter_key(key)
     m.lock(key)
     try:
         value = m.get(key)
@@ -105,9 +110,9 @@ def increment_pessimistic(client=None, method=None):
         m.force_unlock(key)
 
 
-def increment_optimistic(client=None, method=None):
+def increment_optimistic(client=None, method=None, key=None):
     m = _get_map(client)
-    key = _get_counter_key()
+    key = _get_counter_key(key)
     max_attempts = 1000
     for _ in range(max_attempts):
         old_value = m.get(key)
@@ -119,18 +124,17 @@ def increment_optimistic(client=None, method=None):
     raise RuntimeError(f"Optimistic increment failed after {max_attempts} attempts (contention)")
 
 
-def increment_atomic_long(client=None, method=None):
-    return _get_atomic_long(client).increment_and_get()
+def increment_atomic_long(client=None, method=None, key=None):
+    return _get_atomic_long(client, key).increment_and_get()
 
 
-def increment(client=None, method=None):
+def increment(client=None, method=None, key=None):
     if method == "no_lock":
-        return increment_no_lock(client=client, method=method)
+        return increment_no_lock(client=client, method=method, key=key)
     if method == "pessimistic":
-        return increment_pessimistic(client=client, method=method)
+        return increment_pessimistic(client=client, method=method, key=key)
     if method == "optimistic":
-        return increment_optimistic(client=client, method=method)
+        return increment_optimistic(client=client, method=method, key=key)
     if method == "atomic":
-        return increment_atomic_long(client=client, method=method)
+        return increment_atomic_long(client=client, method=method, key=key)
     raise ValueError(f"Invalid method: {method}")
-
@@ -5,7 +5,7 @@ def get_functions():
     return {
         "setup": lambda params: get_connection(),
         "shutdown": lambda params: close_connection(client=params['connection']),
-        "reset": lambda params: reset_counter(client=params.get('connection', None), method=params.get('method', None)),
-        "count": lambda params: get_count(client=params.get('connection', None), method=params.get('method', None)),
-        "increment": lambda params: increment(client=params.get('connection', None), method=params.get('method', None)),
+        "reset": lambda params: reset_counter(client=params.get('connection', None), method=params.get('method', None), keys=params.get('keys', None)),
+        "count": lambda params, key=None: get_count(client=params.get('connection', None), method=params.get('method', None), keys=[key] if key is not None else params.get('keys', None)),
+        "increment": lambda params, key=None: increment(client=params.get('connection', None), method=params.get('method', None), key=key),
     }
\ No newline at end of file
@@ -0,0 +1,62 @@
+import random
+from bisect import bisect_left
+from itertools import accumulate
+
+DEFAULT_HOT_SET_FRACTION = 0.2
+
+
+def key_names(n_keys: int):
+    return [str(i + 1) for i in range(n_keys)]
+
+
+def parse_distribution(spec: str):
+    name, _, arg = (spec or "uniform").partition(":")
+    if name == "uniform":
+        return name, ()
+    if name == "zipf":
+        return name, (float(arg) if arg else 1.0,)
+    if name == "hotspot":
+        op_fraction, _, set_fraction = arg.partition(":")
+        return name, (
+            float(op_fraction) if op_fraction else 0.8,
+            float(set_fraction) if set_fraction else DEFAULT_HOT_SET_FRACTION,
+        )
+    raise ValueError(f"Invalid key distribution: {spec}")
+
+
+def _weights(n_keys: int, name: str, args):
+    if name == "uniform":
+        return None
+    if name == "zipf":
+        (s,) = args
+        return [1.0 / (rank ** s) for rank in range(1, n_keys + 1)]
+    op_fraction, set_fraction = args
+    hot_keys = min(n_keys, max(1, int(n_keys * set_fraction)))
+    cold_keys = n_keys - hot_keys
+    if cold_keys == 0:
+        return None
+    hot = op_fraction / hot_keys
+    cold = (1.0 - op_fraction) / cold_keys
+    return [hot] * hot_keys + [cold] * cold_keys
+
+
+class KeySampler:
+    # Key sequences are drawn up front, one list per client, so choosing a key in
+    # the timed loop is a list index rather than a random draw and a bisect.
+    def __init__(self, n_keys: int, distribution: str = "uniform", seed: int = 0):
+        self.keys = key_names(n_keys)
+        self.distribution = distribution
+        self.seed = seed
+        name, args = parse_distribution(distribution)
+        weights = _weights(n_keys, name, args)
+        self._cumulative = list(accumulate(weights)) if weights else None
+
+    def sequence(self, client_id: int, length: int):
+        rng = random.Random(self.seed * 1_000_003 + client_id)
+        keys = self.keys
+        if self._cumulative is None:
+            return [keys[rng.randrange(len(keys))] for _ in range(length)]
+        cumulative = self._cumulative
+        total = cumulative[-1]
+        last = len(keys) - 1
+        return [keys[min(bisect_left(cumulative, rng.random() * total), last)] for _ in range(length)]
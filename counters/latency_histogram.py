@@ -0,0 +1,112 @@
+# Log-bucketed histogram in the spirit of HdrHistogram: values below
+# 2**SUB_BUCKET_BITS are stored exactly, above that every power of two is split
+# into SUB_BUCKET_HALF linear sub-buckets (~1.5% relative error). The bucket
+# array is allocated once, so record() only does integer arithmetic.
+SUB_BUCKET_BITS = 6
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+MAX_TRACKABLE_NS = (1 << 40) - 1  # ~18 minutes
+BUCKET_COUNT = SUB_BUCKET_COUNT + (MAX_TRACKABLE_NS.bit_length() - SUB_BUCKET_BITS) * SUB_BUCKET_HALF
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def _index_for(value_ns: int) -> int:
+    if value_ns < SUB_BUCKET_COUNT:
+        return value_ns if value_ns > 0 else 0
+    if value_ns > MAX_TRACKABLE_NS:
+        value_ns = MAX_TRACKABLE_NS
+    shift = value_ns.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value_ns >> shift) - SUB_BUCKET_HALF
+
+
+def _value_for(index: int) -> int:
+    if index < SUB_BUCKET_COUNT:
+        return index
+    offset = index - SUB_BUCKET_COUNT
+    shift = offset // SUB_BUCKET_HALF + 1
+    lower = (offset % SUB_BUCKET_HALF + SUB_BUCKET_HALF) << shift
+    return lower + ((1 << shift) - 1) // 2
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total_count = 0
+        self.total_ns = 0
+        self.min_ns = 0
+        self.max_ns = 0
+
+    def record(self, value_ns: int):
+        if value_ns < SUB_BUCKET_COUNT:
+            index = value_ns if value_ns > 0 else 0
+        else:
+            index = _index_for(value_ns)
+        self.counts[index] += 1
+        self.total_ns += value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+        if value_ns < self.min_ns or self.total_count == 0:
+            self.min_ns = value_ns
+        self.total_count += 1
+
+    def merge(self, other: "LatencyHistogram"):
+        if other.total_count == 0:
+            return self
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        if self.total_count == 0 or other.min_ns < self.min_ns:
+            self.min_ns = other.min_ns
+        if other.max_ns > self.max_ns:
+            self.max_ns = other.max_ns
+        self.total_count += other.total_count
+        self.total_ns += other.total_ns
+        return self
+
+    def percentile(self, percentile: float) -> int:
+        if self.total_count == 0:
+            return 0
+        if percentile >= 100.0:
+            return self.max_ns
+        target = max(1, int(self.total_count * percentile / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= target:
+                    return min(_value_for(index), self.max_ns)
+        return self.max_ns
+
+    def mean(self) -> float:
+        return self.total_ns / self.total_count if self.total_count else 0.0
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES) -> dict:
+        result = {
+            "count": self.total_count,
+            "min_ms": self.min_ns / 1e6,
+            "mean_ms": self.mean() / 1e6,
+        }
+        for p in percentiles:
+            result[f"p{p:g}_ms"] = self.percentile(p) / 1e6
+        result["max_ms"] = self.max_ns / 1e6
+        return result
+
+
+def merge_histogram_sets(histogram_sets) -> dict:
+    merged = {}
+    for histogram_set in histogram_sets:
+        for name, histogram in histogram_set.items():
+            merged.setdefault(name, LatencyHistogram()).merge(histogram)
+    return merged
+
+
+def format_summary(label: str, histogram: LatencyHistogram, percentiles=DEFAULT_PERCENTILES) -> str:
+    summary = histogram.summary(percentiles)
+    parts = [f"{label}: n={summary['count']}"]
+    for p in percentiles:
+        parts.append(f"p{p:g}={summary[f'p{p:g}_ms']:.3f}ms")
+    parts.append(f"max={summary['max_ms']:.3f}ms")
+    return " ".join(parts)
+
@@ -0,0 +1,17 @@
+from .memory_counter import (
+    MemoryCounter,
+    get_connection,
+    close_connection,
+    reset_counter,
+    get_count,
+    increment,
+)
+
+__all__ = [
+    "MemoryCounter",
+    "get_connection",
+    "close_connection",
+    "reset_counter",
+    "get_count",
+    "increment",
+]
@@ -0,0 +1,55 @@
+import time
+import threading
+
+DEFAULT_METHOD = "lock"
+DEFAULT_KEY = "1"
+
+
+class MemoryCounter:
+    # One value and one lock per key, like one row per user_id in the databases.
+    def __init__(self, keys=(DEFAULT_KEY,)):
+        self.values = {key: 0 for key in keys}
+        self.locks = {key: threading.Lock() for key in keys}
+
+
+def get_connection(keys=None):
+    # Every key the run uses gets its value and lock up front: --processes
+    # workers set up their own counter but never reset it.
+    return MemoryCounter(keys or (DEFAULT_KEY,))
+
+
+def close_connection(conn):
+    return None
+
+
+def reset_counter(conn: MemoryCounter, keys=None):
+    keys = keys or [DEFAULT_KEY]
+    conn.locks = {key: conn.locks.get(key) or threading.Lock() for key in keys}
+    conn.values = {key: 0 for key in keys}
+    return True
+
+
+def get_count(conn: MemoryCounter, keys=None) -> int:
+    values = conn.values
+    return sum(values.get(key, 0) for key in keys or [DEFAULT_KEY])
+
+
+def increment(conn: MemoryCounter, key: str = DEFAULT_KEY, method: str = DEFAULT_METHOD, latency_ms: float = 0.0, lock_hold_ms: float = 0.0) -> int:
+    # latency_ms simulates a network round trip (no contention); lock_hold_ms is
+    # spent while holding the lock, so concurrent clients queue behind it.
+    if latency_ms:
+        time.sleep(latency_ms / 1000.0)
+    values = conn.values
+    if method == "no_lock":
+        value = values[key]
+        if lock_hold_ms:
+            time.sleep(lock_hold_ms / 1000.0)
+        values[key] = value + 1
+        return 1
+    if method == "lock":
+        with conn.locks[key]:
+            if lock_hold_ms:
+                time.sleep(lock_hold_ms / 1000.0)
+            values[key] += 1
+        return 1
+    raise ValueError(f"Invalid method: {method}")
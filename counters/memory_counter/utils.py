@@ -0,0 +1,17 @@
+from .memory_counter import get_connection, close_connection, reset_counter, get_count, increment, DEFAULT_KEY
+
+
+def get_functions():
+    return {
+        "setup": lambda params: get_connection(params.get("keys")),
+        "shutdown": lambda params: close_connection(params.get("connection")),
+        "reset": lambda params: reset_counter(params.get("connection"), params.get("keys")),
+        "count": lambda params, key=None: get_count(params.get("connection"), [key] if key is not None else params.get("keys")),
+        "increment": lambda params, key=None: increment(
+            params.get("connection"),
+            key or DEFAULT_KEY,
+            method=params.get("method", "lock"),
+            latency_ms=params.get("latency_ms", 0.0),
+            lock_hold_ms=params.get("lock_hold_ms", 0.0),
+        ),
+    }
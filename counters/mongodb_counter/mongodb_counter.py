@@ -32,17 +32,20 @@ def _get_coll(client, db_name, write_concern=None):
     )
 
 
-def init_user_counter_table(user_id: str, conn):
+def init_user_counter_table(user_id, conn):
     client, db_name = conn
     if client is None or db_name is None:
         return False
+    user_ids = [user_id] if isinstance(user_id, str) else list(user_id)
     try:
         coll = _get_coll(client, db_name)
         coll.drop()
-        coll.insert_one({
-            "user_id": user_id,
-            "counter": 0
-        })
+        if len(user_ids) > 1:
+            coll.create_index("user_id", unique=True)
+        coll.insert_many([
+            {"user_id": uid, "counter": 0}
+            for uid in user_ids
+        ])
         return True
     except PyMongoError:
         return False
@@ -60,6 +63,21 @@ def get_user_counter(user_id: str, conn) -> int:
         return 0
 
 
+def get_total_counter(user_ids, conn) -> int:
+    client, db_name = conn
+    if client is None or db_name is None:
+        return 0
+    try:
+        coll = _get_coll(client, db_name)
+        result = list(coll.aggregate([
+            {"$match": {"user_id": {"$in": list(user_ids)}}},
+            {"$group": {"_id": None, "total": {"$sum": "$counter"}}},
+        ]))
+        return result[0]["total"] if result else 0
+    except (PyMongoError, KeyError):
+        return 0
+
+
 def increment(user_id: str, conn, method: str = DEFAULT_METHOD, write_concern=DEFAULT_WRITE_CONCERN) -> int:
     client, db_name = conn
     if client is None or db_name is None:
@@ -3,6 +3,7 @@ from .neo4j_counter import (
     close_connection,
     init_counter,
     get_counter,
+    get_total_counter,
     increment,
 )
 
@@ -11,5 +12,6 @@ __all__ = [
     "close_connection",
     "init_counter",
     "get_counter",
+    "get_total_counter",
     "increment",
 ]
@@ -33,14 +33,15 @@ def close_connection(conn):
             logger.debug("close_connection: %s", e)
 
 
-def init_counter(conn) -> bool:
+def init_counter(conn, counter_id=COUNTER_ID) -> bool:
     if conn is None:
         return False
+    counter_ids = [counter_id] if isinstance(counter_id, str) else list(counter_id)
     try:
         with conn.session() as session:
             session.run(
-                "MERGE (c:Counter {id: $id}) SET c.value = 0",
-                id=COUNTER_ID,
+                "UNWIND $ids AS id MERGE (c:Counter {id: id}) SET c.value = 0",
+                ids=counter_ids,
             )
         return True
     except Exception as e:
@@ -48,14 +49,14 @@ def init_counter(conn) -> bool:
         return False
 
 
-def get_counter(conn) -> int:
+def get_counter(conn, counter_id: str = COUNTER_ID) -> int:
     if conn is None:
         return 0
     try:
         with conn.session() as session:
             result = session.run(
                 "MATCH (c:Counter {id: $id}) RETURN c.value AS value",
-                id=COUNTER_ID,
+                id=counter_id,
             )
             record = result.single()
             return int(record["value"]) if record and record["value"] is not None else 0
@@ -64,7 +65,23 @@ def get_counter(conn) -> int:
         return 0
 
 
-def increment(conn) -> int:
+def get_total_counter(conn, counter_ids) -> int:
+    if conn is None:
+        return 0
+    try:
+        with conn.session() as session:
+            result = session.run(
+                "MATCH (c:Counter) WHERE c.id IN $ids RETURN sum(c.value) AS value",
+                ids=list(counter_ids),
+            )
+            record = result.single()
+            return int(record["value"]) if record and record["value"] is not None else 0
+    except Exception as e:
+        logger.debug("get_total_counter failed: %s", e)
+        return 0
+
+
+def increment(conn, counter_id: str = COUNTER_ID) -> int:
     if conn is None:
         return 0
     try:
@@ -73,7 +90,7 @@ def increment(conn) -> int:
                 "MERGE (c:Counter {id: $id}) "
                 "ON CREATE SET c.value = 1 "
                 "ON MATCH SET c.value = c.value + 1",
-                id=COUNTER_ID,
+                id=counter_id,
             )
         return 1
     except Exception as e:
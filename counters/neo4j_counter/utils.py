@@ -3,15 +3,26 @@ from .neo4j_counter import (
     close_connection,
     init_counter,
     get_counter,
+    get_total_counter,
     increment,
+    COUNTER_ID,
 )
 
 
+def _count(params, key=None):
+    if key is not None:
+        return get_counter(params.get("connection"), key)
+    keys = params.get("keys")
+    if keys:
+        return get_total_counter(params.get("connection"), keys)
+    return get_counter(params.get("connection"))
+
+
 def get_functions():
     return {
         "setup": lambda params: get_connection(),
         "shutdown": lambda params: close_connection(params.get("connection")),
-        "reset": lambda params: init_counter(params.get("connection")),
-        "count": lambda params: get_counter(params.get("connection")),
-        "increment": lambda params: increment(params.get("connection")),
+        "reset": lambda params: init_counter(params.get("connection"), params.get("keys") or COUNTER_ID),
+        "count": _count,
+        "increment": lambda params, key=None: increment(params.get("connection"), key or COUNTER_ID),
     }
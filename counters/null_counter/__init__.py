@@ -0,0 +1,15 @@
+from .null_counter import (
+    get_connection,
+    close_connection,
+    reset_counter,
+    get_count,
+    increment,
+)
+
+__all__ = [
+    "get_connection",
+    "close_connection",
+    "reset_counter",
+    "get_count",
+    "increment",
+]
@@ -0,0 +1,22 @@
+# A backend that does no work at all. Benchmarking it measures the ceiling of
+# the tester itself: function dispatch, params lookups and client bookkeeping.
+
+
+def get_connection():
+    return None
+
+
+def close_connection(conn):
+    return None
+
+
+def reset_counter(conn=None, keys=None):
+    return True
+
+
+def get_count(conn=None, keys=None):
+    return 0
+
+
+def increment(conn=None, key=None):
+    return 1
@@ -0,0 +1,32 @@
+from .null_counter import get_connection, close_connection, reset_counter, get_count, increment
+
+
+def get_functions():
+    return {
+        "setup": lambda params: get_connection(),
+        "shutdown": lambda params: close_connection(params.get("connection")),
+        "reset": lambda params: reset_counter(params.get("connection")),
+        "count": lambda params, key=None: get_count(params.get("connection")),
+        "increment": lambda params, key=None: increment(params.get("connection"), key),
+    }
+
+
+def get_async_functions():
+    async def setup(params):
+        return None
+
+    async def shutdown(params):
+        return None
+
+    async def count(params, key=None):
+        return get_count(params.get("connection"))
+
+    async def increment_async(params, key=None):
+        return increment(params.get("connection"), key)
+
+    return {
+        "setup": setup,
+        "shutdown": shutdown,
+        "count": count,
+        "increment": increment_async,
+    }
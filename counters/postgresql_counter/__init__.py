@@ -2,6 +2,7 @@
 from .postgresql_counter import (
     init_user_counter_table,
     get_user_counter,
+    get_total_counter,
     increment_user_counter,
     get_connection,
     close_connection
@@ -10,6 +11,7 @@ from .postgresql_counter import (
 __all__ = [
     'init_user_counter_table',
     'get_user_counter',
+    'get_total_counter',
     'increment_user_counter',
     'get_connection',
     'close_connection',
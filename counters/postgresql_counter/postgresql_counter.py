@@ -23,6 +23,7 @@ def close_connection(conn):
     conn.close()
 
 def init_user_counter_table(user_id, conn, isolation_level=None):
+    user_ids = [user_id] if isinstance(user_id, str) else list(user_id)
     cursor = None
     try:
         if isolation_level and isolation_level == "serializable":
@@ -43,7 +44,7 @@ def init_user_counter_table(user_id, conn, isolation_level=None):
         
         cursor.execute(create_table_query)
 
-        cursor.execute("INSERT INTO user_counter (user_id, counter) VALUES (%s, %s)", (user_id, 0))
+        cursor.executemany("INSERT INTO user_counter (user_id, counter) VALUES (%s, %s)", [(uid, 0) for uid in user_ids])
 
         conn.commit()
         cursor.close()
@@ -84,6 +85,25 @@ def get_user_counter(user_id: str, conn, isolation_level=None) -> int:
         return 0
 
 
+def get_total_counter(user_ids, conn, isolation_level=None) -> int:
+    try:
+        if isolation_level and isolation_level == "serializable":
+            conn.set_isolation_level(ISOLATION_LEVEL_SERIALIZABLE)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COALESCE(SUM(counter), 0) FROM user_counter WHERE user_id = ANY(%s)", (list(user_ids),))
+        result = cursor.fetchone()
+
+        conn.commit()
+        cursor.close()
+        
+        return int(result[0]) if result else 0
+    except psycopg2.Error:
+        if conn:
+            conn.rollback()
+        return 0
+
+
 def increment_user_counter(user_id: str, conn, method=None, do_retries=False) -> int:
     MAX_RETRIES = 20 if do_retries else 1
     BASE_DELAY = 0.01 if do_retries else 0
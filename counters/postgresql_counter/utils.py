@@ -3,14 +3,27 @@ from .postgresql_counter import (
     close_connection,
     init_user_counter_table,
     get_user_counter,
+    get_total_counter,
     increment_user_counter
 )
 
+DEFAULT_USER_ID = "1"
+
+
+def _count(params, key=None):
+    if key is not None:
+        return get_user_counter(key, params.get('connection', None), params.get('method', None))
+    keys = params.get('keys')
+    if keys:
+        return get_total_counter(keys, params.get('connection', None), params.get('method', None))
+    return get_user_counter(DEFAULT_USER_ID, params.get('connection', None), params.get('method', None))
+
+
 def get_functions():
     return {
         "setup": lambda params: get_connection(),
         "shutdown": lambda params: close_connection(client=params['connection']),
-        "reset": lambda params: init_user_counter_table("1", params.get('connection', None), params.get('method', None)),
-        "count": lambda params: get_user_counter("1", params.get('connection', None), params.get('method', None)),
-        "increment": lambda params: increment_user_counter("1", params.get('connection', None), params.get('method', None), params.get('do_retries', False))
+        "reset": lambda params: init_user_counter_table(params.get('keys') or DEFAULT_USER_ID, params.get('connection', None), params.get('method', None)),
+        "count": _count,
+        "increment": lambda params, key=None: increment_user_counter(key or DEFAULT_USER_ID, params.get('connection', None), params.get('method', None), params.get('do_retries', False))
     }
\ No newline at end of file
@@ -1,10 +1,20 @@
 import os
 import sys
+import random
+import asyncio
 import time
 import logging
 import argparse
+import threading
+import multiprocessing
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from latency_histogram import LatencyHistogram, merge_histogram_sets, format_summary
+from throughput_sampler import ThroughputSampler, merge_samples, build_timeseries, write_timeseries
+from stack_sampler import StackSampler, write_collapsed
+from key_distributions import KeySampler, key_names
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -17,6 +27,9 @@ logger = logging.getLogger(__name__)
 
 def get_counter_functions(counter_type: str, params = None):
     if counter_type == "web":
+        if params and params.get("method") == "binary":
+            from web_counter.utils import get_binary_functions
+            return get_binary_functions()
         from web_counter.utils import get_functions as get_web_counter_functions
         return get_web_counter_functions()
     elif counter_type == "postgresql":
@@ -34,38 +47,158 @@ def get_counter_functions(counter_type: str, params = None):
     elif counter_type == "neo4j":
         from neo4j_counter.utils import get_functions as get_neo4j_counter_functions
         return get_neo4j_counter_functions()
+    elif counter_type == "null":
+        from null_counter.utils import get_functions as get_null_counter_functions
+        return get_null_counter_functions()
+    elif counter_type == "memory":
+        from memory_counter.utils import get_functions as get_memory_counter_functions
+        return get_memory_counter_functions()
     else:
         raise ValueError(f"Invalid counter type: {counter_type}")
 
-def run_performance_test(counter_type: str, n_clients: int, n_calls_per_client: int, params: dict = None):
-    functions = get_counter_functions(counter_type)
-    logger.info(f"Starting performance test {counter_type}: {n_clients} clients, {n_calls_per_client} calls per client")
+def get_async_counter_functions(counter_type: str, params = None):
+    if counter_type == "web":
+        if params and params.get("method") == "binary":
+            from web_counter.utils import get_async_binary_functions
+            return get_async_binary_functions()
+        from web_counter.utils import get_async_functions as get_web_counter_async_functions
+        return get_web_counter_async_functions()
+    elif counter_type == "null":
+        from null_counter.utils import get_async_functions as get_null_counter_async_functions
+        return get_null_counter_async_functions()
+    else:
+        raise ValueError(f"Counter type {counter_type} does not support the asyncio engine")
 
-    connection = functions["setup"](params)
-    params['connection'] = connection
+def _arrival_interval_ns(n_clients: int, target_rps: float = None) -> int:
+    if not target_rps:
+        return 0
+    return max(1, int(n_clients * 1e9 / target_rps))
+
+def _new_histograms(interval_ns: int, read_ratio: float = 0.0) -> dict:
+    histograms = {"latency": LatencyHistogram()}
+    if interval_ns:
+        histograms["service_time"] = LatencyHistogram()
+    if read_ratio:
+        histograms["read_latency"] = LatencyHistogram()
+        if interval_ns:
+            histograms["read_service_time"] = LatencyHistogram()
+    return histograms
+
+def build_stats(histogram_sets=(), target_rps: float = None, total_time: float = 0.0, measured_time: float = 0.0, increments: int = 0, timeseries=None) -> dict:
+    # Every key main() and benchmark_matrix.py read is always present, so a run
+    # that measured nothing (a failed reset) or no reads has empty histograms
+    # and zero rates instead of missing keys.
+    stats = merge_histogram_sets(histogram_sets)
+    for name in ("latency", "service_time", "read_latency", "read_service_time"):
+        stats.setdefault(name, LatencyHistogram())
+    writes = stats["latency"].total_count
+    reads = stats["read_latency"].total_count
+    stats["target_rps"] = target_rps
+    stats["measured_time"] = measured_time
+    stats["achieved_rps"] = (writes + reads) / measured_time if measured_time > 0 else 0
+    # Requests and increments differ once a request carries a batch.
+    stats["increments_per_second"] = increments / total_time if total_time > 0 else 0
+    stats["write_rps"] = writes / measured_time if measured_time > 0 else 0
+    stats["read_rps"] = reads / measured_time if measured_time > 0 else 0
+    stats["timeseries"] = timeseries if timeseries is not None else []
+    return stats
+
+def read_schedule(read_ratio: float, client_id: int, length: int, seed: int = 0):
+    # Which calls are reads is drawn up front from a per-client seed, like the key
+    # sequences, so the parent can recompute the number of increments to expect.
+    if not read_ratio:
+        return [False] * length
+    rng = random.Random(seed * 1_000_003 + client_id)
+    return [rng.random() < read_ratio for _ in range(length)]
+
+def expected_increments(n_clients: int, n_calls_per_client: int, read_ratio: float = 0.0, batch_size: int = 1) -> int:
+    if not read_ratio:
+        return n_clients * n_calls_per_client * batch_size
+    return batch_size * sum(
+        n_calls_per_client - sum(read_schedule(read_ratio, client_id, n_calls_per_client))
+        for client_id in range(n_clients)
+    )
+
+def client_keys(key_sampler, client_id: int, n_calls_per_client: int, batch_size: int = 1):
+    # With batching every call carries batch_size increments, so each call gets a
+    # chunk of that many consecutive keys from the client's sequence.
+    length = n_calls_per_client * batch_size
+    keys = key_sampler.sequence(client_id, length) if key_sampler else [None] * length
+    if batch_size == 1:
+        return keys
+    return [keys[i:i + batch_size] for i in range(0, length, batch_size)]
+
+def _open_window(workload: dict):
+    # The steady-state window is a shared [start, end] pair of perf_counter_ns
+    # timestamps. It lives in shared memory so forked worker processes agree on it.
+    window = workload.get("window")
+    if window is None:
+        return 0, None
+    if not window[0]:
+        window[0] = time.perf_counter_ns() + workload.get("warmup_ns", 0)
+        if workload.get("measure_ns"):
+            window[1] = window[0] + workload["measure_ns"]
+    return window[0], window
+
+def _close_window(workload: dict, window, finished: int):
+    # Without an explicit --measure the window ends when the first client is done,
+    # which cuts off the ragged tail where only the slow clients are still running.
+    if window is not None and not workload.get("measure_ns") and (not window[1] or finished < window[1]):
+        window[1] = finished
+
+def run_thread_clients(functions: dict, n_clients: int, n_calls_per_client: int, params: dict, workload: dict = None, completed: list = None):
+    workload = workload or {}
+    completed = completed if completed is not None else [0] * n_clients
+    # Open-loop mode: every client owns a fixed arrival timeline and latency is
+    # measured from the intended send time, so backend stalls show up as
+    # queueing delay instead of silently lowering the offered load.
+    interval_ns = _arrival_interval_ns(n_clients, workload.get("target_rps"))
+    window_start, window = _open_window(workload)
+    key_sampler = workload.get("key_sampler")
+    client_offset = workload.get("client_offset", 0)
+    read_ratio = workload.get("read_ratio", 0.0)
+    batch_size = workload.get("batch_size", 1)
 
-    try:
-        logger.info(f"Resetting counter")
-        functions["reset"](params)
-        logger.info(f"Counter reset successfully")
-    except Exception as e:
-        logger.error(f"Failed to reset counter: {e}")
-        return 0, 0, 0, 0
-    
-    try:
-        initial_count = functions["count"](params)
-        logger.info(f"Initial count: {initial_count}")
-    except Exception as e:
-        logger.error(f"Failed to get initial count: {e}")
-        initial_count = 0
-    
     def client_worker(client_id: int):
         success_count = 0
+        keys = client_keys(key_sampler, client_offset + client_id, n_calls_per_client, batch_size)
+        reads = read_schedule(read_ratio, client_offset + client_id, n_calls_per_client)
+        histograms = _new_histograms(interval_ns, read_ratio)
+        recorders = {
+            False: (histograms["latency"].record, histograms["service_time"].record if interval_ns else None),
+            True: (histograms["read_latency"].record, histograms["read_service_time"].record if interval_ns else None) if read_ratio else None,
+        }
+        increment = functions["increment_batch"] if batch_size > 1 else functions["increment"]
+        count = functions["count"]
+        clock = time.perf_counter_ns
+        sleep = time.sleep
+        next_send = clock() + interval_ns * client_id // n_clients
         logger.info(f"Client {client_id} started making {n_calls_per_client} requests")
         
         for i in range(n_calls_per_client):
             try:
-                successful = functions["increment"](params)
+                if interval_ns:
+                    intended = next_send
+                    next_send += interval_ns
+                    delay = intended - clock()
+                    if delay > 0:
+                        sleep(delay / 1e9)
+                is_read = reads[i]
+                started = clock()
+                if is_read:
+                    count(params, keys[i][0] if batch_size > 1 else keys[i])
+                    successful = True
+                else:
+                    successful = increment(params, keys[i])
+                finished = clock()
+                completed[client_id] += 1
+                if window is None or (started >= window_start and (not window[1] or finished <= window[1])):
+                    record, record_service = recorders[is_read]
+                    if interval_ns:
+                        record(finished - intended)
+                        record_service(finished - started)
+                    else:
+                        record(finished - started)
                 if successful:
                     success_count += 1
 
@@ -74,28 +207,263 @@ def run_performance_test(counter_type: str, n_clients: int, n_calls_per_client:
             except Exception as e:
                 logger.warning(f"Client {client_id}, call {i+1} failed: {e}")
         
+        flush = functions.get("flush")
+        if flush is not None:
+            try:
+                # Pipelined increments count as successful until their responses
+                # are read; flush reads the rest and returns the failures among them.
+                success_count -= flush(params)
+            except Exception as e:
+                logger.warning(f"Client {client_id} failed to read its pipelined responses: {e}")
+        _close_window(workload, window, clock())
         logger.info(f"Client {client_id} completed {success_count}/{n_calls_per_client} calls")
         sys.stdout.flush()
-        return success_count
-    
-    start_time = time.time()
-    
+        return success_count, histograms
+
+    total_successful_calls = 0
+    histograms = []
     with ThreadPoolExecutor(max_workers=n_clients) as executor:
         futures = [
             executor.submit(client_worker, client_id)
             for client_id in range(n_clients)
         ]
         
-        total_successful_calls = 0
         for future in as_completed(futures):
             try:
-                success_count = future.result()
+                success_count, client_histograms = future.result()
                 total_successful_calls += success_count
+                histograms.append(client_histograms)
             except Exception as e:
                 logger.error(f"Client task failed: {e}")
-    
+
+    return total_successful_calls, histograms
+
+def run_asyncio_clients(counter_type: str, n_clients: int, n_calls_per_client: int, params: dict, workload: dict = None, completed: list = None):
+    async_functions = get_async_counter_functions(counter_type, params)
+    workload = workload or {}
+    completed = completed if completed is not None else [0] * n_clients
+    interval_ns = _arrival_interval_ns(n_clients, workload.get("target_rps"))
+    key_sampler = workload.get("key_sampler")
+    client_offset = workload.get("client_offset", 0)
+    read_ratio = workload.get("read_ratio", 0.0)
+    batch_size = workload.get("batch_size", 1)
+
+    async def run():
+        # One event loop means one thread, so every logical client can share a
+        # single set of histograms without synchronization.
+        histograms = _new_histograms(interval_ns, read_ratio)
+        recorders = {
+            False: (histograms["latency"].record, histograms["service_time"].record if interval_ns else None),
+            True: (histograms["read_latency"].record, histograms["read_service_time"].record if interval_ns else None) if read_ratio else None,
+        }
+        increment = async_functions["increment_batch"] if batch_size > 1 else async_functions["increment"]
+        count = async_functions["count"]
+        clock = time.perf_counter_ns
+        sleep = asyncio.sleep
+        window_start, window = _open_window(workload)
+
+        async def client_worker(client_id: int):
+            success_count = 0
+            keys = client_keys(key_sampler, client_offset + client_id, n_calls_per_client, batch_size)
+            reads = read_schedule(read_ratio, client_offset + client_id, n_calls_per_client)
+            next_send = clock() + interval_ns * client_id // n_clients
+            for i in range(n_calls_per_client):
+                try:
+                    if interval_ns:
+                        intended = next_send
+                        next_send += interval_ns
+                        delay = intended - clock()
+                        if delay > 0:
+                            await sleep(delay / 1e9)
+                    is_read = reads[i]
+                    started = clock()
+                    if is_read:
+                        await count(params, keys[i][0] if batch_size > 1 else keys[i])
+                        successful = True
+                    else:
+                        successful = await increment(params, keys[i])
+                    finished = clock()
+                    completed[client_id] += 1
+                    if window is None or (started >= window_start and (not window[1] or finished <= window[1])):
+                        record, record_service = recorders[is_read]
+                        if interval_ns:
+                            record(finished - intended)
+                            record_service(finished - started)
+                        else:
+                            record(finished - started)
+                    if successful:
+                        success_count += 1
+                except Exception as e:
+                    logger.warning(f"Client {client_id}, call {i+1} failed: {e}")
+            _close_window(workload, window, clock())
+            return success_count
+
+        await async_functions["setup"](params)
+        try:
+            results = await asyncio.gather(
+                *(client_worker(client_id) for client_id in range(n_clients)),
+                return_exceptions=True,
+            )
+        finally:
+            await async_functions["shutdown"](params)
+
+        total_successful_calls = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"Client task failed: {result}")
+            else:
+                total_successful_calls += result
+        logger.info(f"{n_clients} asyncio clients completed {total_successful_calls}/{n_clients * n_calls_per_client} calls")
+        return total_successful_calls, [histograms]
+
+    return asyncio.run(run())
+
+def run_clients(counter_type: str, functions: dict, n_clients: int, n_calls_per_client: int, params: dict, engine: str = "thread", workload: dict = None):
+    workload = workload or {}
+    sampler = ThroughputSampler(n_clients, workload.get("sample_interval", 1.0)).start()
+    profiler = StackSampler().start() if workload.get("profile") else None
+    try:
+        if engine == "asyncio":
+            total_successful_calls, histograms = run_asyncio_clients(counter_type, n_clients, n_calls_per_client, params, workload, sampler.completed)
+        elif engine == "thread":
+            total_successful_calls, histograms = run_thread_clients(functions, n_clients, n_calls_per_client, params, workload, sampler.completed)
+        else:
+            raise ValueError(f"Invalid engine: {engine}")
+    finally:
+        samples = sampler.stop()
+        stacks = profiler.stop() if profiler is not None else None
+    return total_successful_calls, histograms, samples, stacks
+
+def _process_worker(process_id: int, counter_type: str, n_clients: int, n_calls_per_client: int, params: dict, engine: str, workload: dict, barrier, results):
+    # Any setup failure must still put a result, or the parent waits forever.
+    try:
+        functions = get_counter_functions(counter_type, params)
+        params['connection'] = functions["setup"](params)
+    except Exception as e:
+        logger.error(f"Process {process_id} failed to set up connection: {e}")
+        barrier.abort()
+        results.put((process_id, 0, [], [], None))
+        return
+
+    try:
+        barrier.wait()
+        total_successful_calls, histograms, samples, stacks = run_clients(counter_type, functions, n_clients, n_calls_per_client, params, engine, workload)
+        logger.info(f"Process {process_id} completed {total_successful_calls}/{n_clients * n_calls_per_client} calls")
+        results.put((process_id, total_successful_calls, histograms, samples, stacks))
+    except threading.BrokenBarrierError:
+        logger.error(f"Process {process_id} aborted: another process failed to start")
+        results.put((process_id, 0, [], [], None))
+    except Exception as e:
+        logger.error(f"Process {process_id} failed: {e}")
+        results.put((process_id, 0, [], [], None))
+    finally:
+        try:
+            functions["shutdown"](params)
+        except Exception as e:
+            logger.warning(f"Process {process_id} failed to shut down connection: {e}")
+
+def run_process_clients(counter_type: str, n_clients: int, n_calls_per_client: int, params: dict, engine: str, processes: int, workload: dict = None):
+    base, extra = divmod(n_clients, processes)
+    shares = [base + (1 if process_id < extra else 0) for process_id in range(processes)]
+    shares = [share for share in shares if share > 0]
+
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(len(shares) + 1)
+    results = ctx.Queue()
+    # The parent's connection and client sessions must not be shared across fork.
+    worker_params = {k: v for k, v in params.items() if k != 'connection' and not k.startswith('_')}
+
+    workload = workload or {}
+    workers = []
+    client_offset = 0
+    for process_id, process_clients in enumerate(shares):
+        process_workload = dict(workload)
+        process_workload["client_offset"] = client_offset
+        client_offset += process_clients
+        if workload.get("target_rps"):
+            process_workload["target_rps"] = workload["target_rps"] * process_clients / n_clients
+        worker = ctx.Process(
+            target=_process_worker,
+            args=(process_id, counter_type, process_clients, n_calls_per_client, dict(worker_params), engine, process_workload, barrier, results),
+        )
+        worker.start()
+        workers.append(worker)
+
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        logger.error("A worker process failed to start, aborting run")
+    start_time = time.time()
+
+    total_successful_calls = 0
+    histograms = []
+    sample_sets = []
+    stacks = Counter() if workload.get("profile") else None
+    for _ in workers:
+        _, success_count, process_histograms, samples, process_stacks = results.get()
+        total_successful_calls += success_count
+        histograms.extend(process_histograms)
+        sample_sets.append(samples)
+        if stacks is not None and process_stacks:
+            stacks.update(process_stacks)
     end_time = time.time()
-    total_time = end_time - start_time
+
+    for worker in workers:
+        worker.join()
+
+    return total_successful_calls, histograms, merge_samples(sample_sets), stacks, end_time - start_time
+
+def run_performance_test(counter_type: str, n_clients: int, n_calls_per_client: int, params: dict = None, engine: str = "thread", processes: int = 1, target_rps: float = None, warmup: float = 0.0, measure: float = None, timeseries_out: str = None, profile: str = None, keys: int = 1, distribution: str = "uniform", read_ratio: float = 0.0, batch_size: int = 1):
+    if not 0.0 <= read_ratio < 1.0:
+        raise ValueError(f"Invalid read ratio: {read_ratio}")
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size: {batch_size}")
+    functions = get_counter_functions(counter_type, params)
+    if batch_size > 1 and "increment_batch" not in functions:
+        raise ValueError(f"Counter type {counter_type} does not support batched increments")
+    workload = {"target_rps": target_rps, "profile": profile is not None, "read_ratio": read_ratio, "batch_size": batch_size}
+    if keys > 1:
+        params['keys'] = key_names(keys)
+        workload["key_sampler"] = KeySampler(keys, distribution)
+        logger.info(f"Multi-key workload: {keys} keys, {distribution} distribution")
+    if read_ratio:
+        logger.info(f"Mixed workload: {read_ratio:.0%} of calls read the count")
+    if batch_size > 1:
+        logger.info(f"Batched workload: {batch_size} increments per request")
+    steady_state = bool(warmup or measure)
+    if steady_state:
+        workload["warmup_ns"] = int(warmup * 1e9)
+        workload["measure_ns"] = int(measure * 1e9) if measure else 0
+        workload["window"] = multiprocessing.RawArray('q', 2)
+    mode = f"open loop at {target_rps} RPS" if target_rps else "closed loop"
+    logger.info(f"Starting performance test {counter_type} ({engine} engine, {processes} process(es), {mode}): {n_clients} clients, {n_calls_per_client} calls per client")
+
+    connection = functions["setup"](params)
+    params['connection'] = connection
+
+    try:
+        logger.info(f"Resetting counter")
+        functions["reset"](params)
+        logger.info(f"Counter reset successfully")
+    except Exception as e:
+        logger.error(f"Failed to reset counter: {e}")
+        return 0, 0, 0, 0, build_stats(target_rps=target_rps)
+    
+    try:
+        initial_count = functions["count"](params)
+        logger.info(f"Initial count: {initial_count}")
+    except Exception as e:
+        logger.error(f"Failed to get initial count: {e}")
+        initial_count = 0
+    
+    start_ns = time.perf_counter_ns()
+    if processes > 1:
+        total_successful_calls, histograms, samples, stacks, total_time = run_process_clients(counter_type, n_clients, n_calls_per_client, params, engine, processes, workload)
+    else:
+        start_time = time.time()
+        total_successful_calls, histograms, samples, stacks = run_clients(counter_type, functions, n_clients, n_calls_per_client, params, engine, workload)
+        end_time = time.time()
+        total_time = end_time - start_time
     
     try:
         final_count = functions["count"](params)
@@ -107,20 +475,107 @@ def run_performance_test(counter_type: str, n_clients: int, n_calls_per_client:
     functions["shutdown"](params)
     
     count_increase = final_count - initial_count
-    expected_count = n_clients * n_calls_per_client
+    total_calls = n_clients * n_calls_per_client
+    expected_count = expected_increments(n_clients, n_calls_per_client, read_ratio, batch_size)
     
-    requests_per_second = expected_count / total_time if total_time > 0 else 0
+    requests_per_second = total_calls / total_time if total_time > 0 else 0
+    measured_time = total_time
+    window_end_s = None
+    if steady_state:
+        window_start_ns, window_end_ns = workload["window"]
+        measured_time = max(0.0, (window_end_ns - window_start_ns) / 1e9)
+        window_end_s = (window_end_ns - start_ns) / 1e9
+    stats = build_stats(histograms, target_rps, total_time, measured_time, expected_count, build_timeseries(samples, warmup, window_end_s))
+    latency = stats["latency"]
+    read_latency = stats["read_latency"]
+    measured_calls = latency.total_count + read_latency.total_count
+    label = f"{counter_type}/{params.get('method') or 'default'}"
     
     logger.info(f"Performance test completed {counter_type}:")
     logger.info(f"  Clients: {n_clients}")
     logger.info(f"  Calls per client: {n_calls_per_client}")
     logger.info(f"  Expected count increase: {expected_count}")
     logger.info(f"  Actual count increase: {count_increase}")
+    if read_ratio:
+        logger.info(f"  Reads / writes: {total_calls - expected_count // batch_size} / {expected_count // batch_size}")
+    if keys > 1:
+        logger.info(f"  Count check (sum over {keys} keys): {'OK' if count_increase == expected_count else 'MISMATCH'}")
     logger.info(f"  Total time: {total_time:.2f}s")
     logger.info(f"  Requests per second: {requests_per_second:.2f}")
+    if batch_size > 1:
+        logger.info(f"  Increments per second: {stats['increments_per_second']:.2f} ({batch_size} per request)")
+    if steady_state:
+        logger.info(f"  Steady state: {measured_calls} calls in {measured_time:.2f}s after {warmup:.2f}s warmup, {stats['achieved_rps']:.2f} RPS")
+    if read_ratio:
+        logger.info(f"  Write throughput: {stats['write_rps']:.2f} RPS, read throughput: {stats['read_rps']:.2f} RPS")
+    if target_rps:
+        logger.info(f"  Target rate: {target_rps:.2f} RPS, achieved: {stats['achieved_rps']:.2f} RPS")
+        if read_ratio:
+            logger.info(f"  Corrected write latency {format_summary(label, latency)}")
+            logger.info(f"  Write service time {format_summary(label, stats['service_time'])}")
+            logger.info(f"  Corrected read latency {format_summary(label, read_latency)}")
+            logger.info(f"  Read service time {format_summary(label, stats['read_service_time'])}")
+        else:
+            logger.info(f"  Corrected latency {format_summary(label, latency)}")
+            logger.info(f"  Service time {format_summary(label, stats['service_time'])}")
+    elif read_ratio:
+        logger.info(f"  Write latency {format_summary(label, latency)}")
+        logger.info(f"  Read latency {format_summary(label, read_latency)}")
+    else:
+        logger.info(f"  Latency {format_summary(label, latency)}")
+    if timeseries_out:
+        write_timeseries(timeseries_out, stats["timeseries"], {
+            "counter_type": counter_type,
+            "method": params.get('method'),
+            "n_clients": n_clients,
+            "n_calls_per_client": n_calls_per_client,
+            "engine": engine,
+            "processes": processes,
+            "target_rps": target_rps,
+            "warmup": warmup,
+            "measure": measure,
+            "read_ratio": read_ratio,
+            "batch_size": batch_size,
+        })
+        logger.info(f"  Throughput time series written to {timeseries_out}")
+    if stacks is not None:
+        profile_path = profile or f"profile_{counter_type}_{params.get('method') or 'default'}_{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+        write_collapsed(profile_path, stacks)
+        logger.info(f"  Collapsed stacks ({sum(stacks.values())} samples) written to {profile_path}")
     sys.stdout.flush()
     
-    return count_increase, total_time, requests_per_second, final_count
+    return count_increase, total_time, requests_per_second, final_count, stats
+
+
+def build_params(counter_type: str, counter_host=None, counter_port=None, method=None, do_retries=False, write_concern=None, engine="thread", connections=100, latency_ms=0.0, lock_hold_ms=0.0, pipeline_depth=1, hedge_after_ms=None):
+    params = {}
+    if counter_type == "web":
+        if counter_host:
+            params['counter_host'] = counter_host
+        if counter_port:
+            params['counter_port'] = counter_port
+        if engine == "asyncio":
+            params['connections'] = connections
+        if pipeline_depth > 1:
+            params['pipeline_depth'] = pipeline_depth
+        if hedge_after_ms:
+            params['hedge_after_ms'] = hedge_after_ms
+    if counter_type in ("web", "postgresql", "hazelcast", "mongodb", "memory"):
+        if method:
+            params['method'] = method
+    if counter_type == "memory":
+        params['latency_ms'] = latency_ms
+        params['lock_hold_ms'] = lock_hold_ms
+    if counter_type in ("postgresql"):
+        if do_retries:
+            params['do_retries'] = do_retries
+    if counter_type == "mongodb" and write_concern is not None:
+        write_concern = str(write_concern)
+        if write_concern.isdigit():
+            params['write_concern'] = int(write_concern)
+        else:
+            params['write_concern'] = write_concern
+    return params
 
 
 def main():
@@ -155,6 +610,18 @@ def main():
 
   # Neo4j (Counter node, atomic MERGE/ON MATCH SET)
   python productivity_tester.py --counter-type neo4j --n-clients 10 --n-calls-per-client 1000
+
+  # Harness ceiling: no backend at all
+  python productivity_tester.py --counter-type null --n-clients 10 --n-calls-per-client 100000
+
+  # In-memory counter with 1ms of injected latency and 0.1ms spent under the lock
+  python productivity_tester.py --counter-type memory --n-clients 10 --n-calls-per-client 1000 --latency-ms 1 --lock-hold-ms 0.1
+
+  # 30% of calls read the count, read and write latency reported separately
+  python productivity_tester.py --counter-type memory --n-clients 10 --n-calls-per-client 1000 --read-ratio 0.3
+
+  # Web counter driven by 10000 logical clients from one event loop over 200 keep-alive connections
+  python productivity_tester.py --counter-type web --n-clients 10000 --n-calls-per-client 10 --engine asyncio --connections 200
         """
     )
     
@@ -197,7 +664,7 @@ def main():
         '--method',
         type=str,
         default=None,
-        help='Method to use for the non web counter'
+        help='Method to use: the backend\'s method, or http (default) / binary for the web counter (binary connects to --counter-port as the server\'s BINARY_PORT)'
     )
 
     parser.add_argument(
@@ -214,41 +681,187 @@ def main():
         help='Write concern for MongoDB counter operations'
     )
     
+    parser.add_argument(
+        '--keys',
+        type=int,
+        default=1,
+        help='Number of counter keys to spread increments over (default: 1, the single hard-coded key)'
+    )
+
+    parser.add_argument(
+        '--distribution',
+        type=str,
+        default='uniform',
+        help='Key distribution for --keys > 1: uniform, zipf:<s> or hotspot:<op_fraction>[:<key_fraction>] (default: uniform)'
+    )
+
+    parser.add_argument(
+        '--read-ratio',
+        type=float,
+        default=0.0,
+        help='Fraction of calls that read the count instead of incrementing it (default: 0, increments only)'
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1,
+        help='Increments carried by each write request, sent through the backend\'s batch call (default: 1, web only above 1)'
+    )
+
+    parser.add_argument(
+        '--latency-ms',
+        type=float,
+        default=0.0,
+        help='Latency injected into every increment of the memory counter (default: 0)'
+    )
+
+    parser.add_argument(
+        '--lock-hold-ms',
+        type=float,
+        default=0.0,
+        help='Time the memory counter holds its lock per increment, to simulate contention (default: 0)'
+    )
+
+    parser.add_argument(
+        '--engine',
+        type=str,
+        choices=('thread', 'asyncio'),
+        default='thread',
+        help='Load generator engine: one OS thread per client, or one event loop for all clients (web only)'
+    )
+
+    parser.add_argument(
+        '--target-rps',
+        type=float,
+        default=None,
+        help='Open-loop mode: total arrival rate spread evenly over the clients; latency is measured from the intended send time'
+    )
+
+    parser.add_argument(
+        '--warmup',
+        type=float,
+        default=0.0,
+        help='Seconds at the start of the run excluded from latency and steady-state throughput (default: 0)'
+    )
+
+    parser.add_argument(
+        '--measure',
+        type=float,
+        default=None,
+        help='Length of the measured steady-state window in seconds (default: until the first client finishes)'
+    )
+
+    parser.add_argument(
+        '--timeseries-out',
+        type=str,
+        default=None,
+        help='Write the per-second throughput time series to this file (.json or .csv)'
+    )
+
+    parser.add_argument(
+        '--profile',
+        type=str,
+        nargs='?',
+        const='',
+        default=None,
+        help='Sample the stacks of all client threads and write them as collapsed stacks (optional output path)'
+    )
+
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help='Number of worker processes to spread the clients over, each with its own backend connection (default: 1)'
+    )
+
+    parser.add_argument(
+        '--connections',
+        type=int,
+        default=100,
+        help='Size of the keep-alive connection pool used by the asyncio engine (default: 100)'
+    )
+
+    parser.add_argument(
+        '--pipeline-depth',
+        type=int,
+        default=1,
+        help='HTTP/1.1 requests each web client keeps in flight on its connection, thread engine only (default: 1, no pipelining)'
+    )
+
+    parser.add_argument(
+        '--hedge-after-ms',
+        type=float,
+        default=None,
+        help='Send each web increment with an Idempotency-Key and send it again on a second connection if no response came within this many ms. A copy that reaches the server while the first is being applied gets 409 and the client waits for the first, so hedging only cuts delays before the server claims the request; one increment at a time per client, so --pipeline-depth has no effect (default: off)'
+    )
+    
     args = parser.parse_args()
 
-    params = {}
-    if args.counter_type == "web":
-        if args.counter_host:
-            params['counter_host'] = args.counter_host
-        if args.counter_port:
-            params['counter_port'] = args.counter_port
-    if args.counter_type in ("postgresql", "hazelcast", "mongodb"):
-        if args.method:
-            params['method'] = args.method
-    if args.counter_type in ("postgresql"):
-        if args.do_retries:
-            params['do_retries'] = args.do_retries
-    if args.counter_type == "mongodb" and args.write_concern is not None:
-        if args.write_concern.isdigit():
-            params['write_concern'] = int(args.write_concern)
-        else:
-            params['write_concern'] = args.write_concern
+    params = build_params(
+        args.counter_type,
+        counter_host=args.counter_host,
+        counter_port=args.counter_port,
+        method=args.method,
+        do_retries=args.do_retries,
+        write_concern=args.write_concern,
+        engine=args.engine,
+        connections=args.connections,
+        pipeline_depth=args.pipeline_depth,
+        hedge_after_ms=args.hedge_after_ms,
+        latency_ms=args.latency_ms,
+        lock_hold_ms=args.lock_hold_ms,
+    )
 
-    count_increase, total_time, requests_per_second, final_count = run_performance_test(
+    count_increase, total_time, requests_per_second, final_count, stats = run_performance_test(
         counter_type=args.counter_type,
         n_clients=args.n_clients,
         n_calls_per_client=args.n_calls_per_client,
-        params=params
+        params=params,
+        engine=args.engine,
+        processes=args.processes,
+        target_rps=args.target_rps,
+        warmup=args.warmup,
+        measure=args.measure,
+        timeseries_out=args.timeseries_out,
+        profile=args.profile,
+        keys=args.keys,
+        distribution=args.distribution,
+        read_ratio=args.read_ratio,
+        batch_size=args.batch_size
     )
     
     print("\n" + "="*60)
     print("PERFORMANCE TEST RESULTS")
     print("="*60)
     print(f"Number of clients:           {args.n_clients}")
+    print(f"Number of processes:         {args.processes}")
     print(f"Calls per client:            {args.n_calls_per_client}")
     print(f"Total time (seconds):        {total_time:.2f}")
     print(f"Requests per second (RPS):   {requests_per_second:.2f}")
+    if args.batch_size > 1:
+        print(f"Increments per second:       {stats['increments_per_second']:.2f}")
     print(f"Final count:                 {final_count}")
+    if args.warmup or args.measure:
+        print(f"Steady-state time (seconds): {stats['measured_time']:.2f}")
+        print(f"Steady-state RPS:            {stats['achieved_rps']:.2f}")
+    if args.target_rps:
+        print(f"Target RPS:                  {args.target_rps:.2f}")
+        print(f"Achieved RPS:                {stats['achieved_rps']:.2f}")
+        print("Latency below is corrected for coordinated omission (measured from intended send time)")
+    if args.read_ratio:
+        print(f"Write RPS:                   {stats['write_rps']:.2f}")
+        print(f"Read RPS:                    {stats['read_rps']:.2f}")
+        sections = (("Write latency", stats["latency"]), ("Read latency", stats["read_latency"]))
+    else:
+        sections = (("Latency", stats["latency"]),)
+    for name, histogram in sections:
+        latency = histogram.summary()
+        print(f"{name + ' p50 (ms):':<29}{latency['p50_ms']:.3f}")
+        print(f"{name + ' p90 (ms):':<29}{latency['p90_ms']:.3f}")
+        print(f"{name + ' p99 (ms):':<29}{latency['p99_ms']:.3f}")
+        print(f"{name + ' p99.9 (ms):':<29}{latency['p99.9_ms']:.3f}")
+        print(f"{name + ' max (ms):':<29}{latency['max_ms']:.3f}")
     print("="*60)
     
     return 0
@@ -0,0 +1,83 @@
+import csv
+import json
+import threading
+import time
+
+
+class ThroughputSampler:
+    def __init__(self, n_slots: int, interval: float = 1.0):
+        # One slot per client: each client only ever bumps its own slot, so no
+        # lock is needed and the sampler just sums the slots once per interval.
+        self.completed = [0] * n_slots
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="throughput-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        completed = self.completed
+        last_total = 0
+        next_tick = self._started + self.interval
+        while not self._stop.wait(max(0.0, next_tick - time.perf_counter())):
+            total = sum(completed)
+            self.samples.append((round(next_tick - self._started, 6), total - last_total))
+            last_total = total
+            next_tick += self.interval
+        total = sum(completed)
+        if total > last_total:
+            self.samples.append((round(time.perf_counter() - self._started, 6), total - last_total))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+
+def merge_samples(sample_sets):
+    merged = []
+    for samples in sample_sets:
+        for index, (elapsed, ops) in enumerate(samples):
+            if index < len(merged):
+                merged[index] = (max(merged[index][0], elapsed), merged[index][1] + ops)
+            else:
+                merged.append((elapsed, ops))
+    return merged
+
+
+def build_timeseries(samples, warmup: float = 0.0, window_end: float = None):
+    rows = []
+    previous = 0.0
+    for elapsed, ops in samples:
+        duration = elapsed - previous
+        if elapsed <= warmup:
+            phase = "warmup"
+        elif window_end is not None and previous >= window_end:
+            phase = "tail"
+        else:
+            phase = "steady"
+        rows.append({
+            "second": elapsed,
+            "ops": ops,
+            "ops_per_sec": round(ops / duration, 2) if duration > 0 else 0.0,
+            "phase": phase,
+        })
+        previous = elapsed
+    return rows
+
+
+def write_timeseries(path: str, rows, meta: dict = None):
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump({"meta": meta or {}, "series": rows}, f, indent=2)
+    else:
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["second", "ops", "ops_per_sec", "phase"])
+            writer.writeheader()
+            writer.writerows(rows)
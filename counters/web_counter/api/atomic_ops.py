@@ -0,0 +1,116 @@
+import ctypes
+import ctypes.util
+
+# libatomic is the GCC runtime behind the __atomic builtins. For a naturally
+# aligned 8-byte word on x86-64 and aarch64 it runs a single lock-prefixed
+# instruction (or an LL/SC loop), which is atomic across processes that map the
+# same memory, with no syscall and no lock file.
+_SEQ_CST = 5
+
+
+def _load_libatomic():
+    candidates = [ctypes.util.find_library("atomic"), "libatomic.so.1", "libatomic.dylib"]
+    errors = []
+    for name in candidates:
+        if not name:
+            continue
+        try:
+            lib = ctypes.CDLL(name)
+        except OSError as e:
+            errors.append(f"{name}: {e}")
+            continue
+        lib.__atomic_fetch_add_8.argtypes = (ctypes.c_void_p, ctypes.c_int64, ctypes.c_int)
+        lib.__atomic_fetch_add_8.restype = ctypes.c_int64
+        lib.__atomic_load_8.argtypes = (ctypes.c_void_p, ctypes.c_int)
+        lib.__atomic_load_8.restype = ctypes.c_int64
+        lib.__atomic_store_8.argtypes = (ctypes.c_void_p, ctypes.c_int64, ctypes.c_int)
+        lib.__atomic_store_8.restype = None
+        lib.__atomic_compare_exchange_8.argtypes = (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int64, ctypes.c_int, ctypes.c_int)
+        lib.__atomic_compare_exchange_8.restype = ctypes.c_bool
+        # Resolved here rather than in AtomicInt64: inside a class body the
+        # double-underscore names would be mangled to _AtomicInt64__atomic_...
+        return {
+            "fetch_add": lib.__atomic_fetch_add_8,
+            "load": lib.__atomic_load_8,
+            "store": lib.__atomic_store_8,
+            "compare_exchange": lib.__atomic_compare_exchange_8,
+        }
+    raise OSError(f"libatomic not available ({'; '.join(errors) or 'not found'})")
+
+
+_functions = None
+
+
+def _get_lib():
+    global _functions
+    if _functions is None:
+        _functions = _load_libatomic()
+    return _functions
+
+
+def buffer_address(buf, offset: int = 0) -> int:
+    # Take the address through a temporary ctypes view and drop the view right
+    # away: a live export would make SharedMemory.close() raise BufferError.
+    view = ctypes.c_char.from_buffer(buf, offset)
+    address = ctypes.addressof(view)
+    del view
+    return address
+
+
+class AtomicInt64:
+    """Signed 64-bit integer at `offset` in a shared buffer (mmap or SharedMemory.buf)."""
+
+    def __init__(self, buf, offset: int = 0):
+        if offset % 8:
+            raise ValueError(f"AtomicInt64 offset must be 8-byte aligned, got {offset}")
+        functions = _get_lib()
+        self.address = buffer_address(buf, offset)
+        self._fetch_add = functions["fetch_add"]
+        self._load = functions["load"]
+        self._store = functions["store"]
+        self._compare_exchange = functions["compare_exchange"]
+
+    def fetch_add(self, delta: int = 1) -> int:
+        return self._fetch_add(self.address, delta, _SEQ_CST)
+
+    def add_fetch(self, delta: int = 1) -> int:
+        return self._fetch_add(self.address, delta, _SEQ_CST) + delta
+
+    def load(self) -> int:
+        return self._load(self.address, _SEQ_CST)
+
+    def store(self, value: int):
+        self._store(self.address, value, _SEQ_CST)
+
+    def compare_exchange(self, expected: int, desired: int) -> bool:
+        expected_value = ctypes.c_int64(expected)
+        return self._compare_exchange(self.address, ctypes.byref(expected_value), desired, _SEQ_CST, _SEQ_CST)
+
+
+class AtomicWords:
+    """Array of signed 64-bit words in a shared buffer, addressed by word index.
+
+    One object for a whole table instead of an AtomicInt64 per slot.
+    """
+
+    def __init__(self, buf):
+        functions = _get_lib()
+        self.address = buffer_address(buf)
+        self.length = len(buf) // 8
+        self._fetch_add = functions["fetch_add"]
+        self._load = functions["load"]
+        self._store = functions["store"]
+        self._compare_exchange = functions["compare_exchange"]
+
+    def fetch_add(self, index: int, delta: int = 1) -> int:
+        return self._fetch_add(self.address + index * 8, delta, _SEQ_CST)
+
+    def load(self, index: int) -> int:
+        return self._load(self.address + index * 8, _SEQ_CST)
+
+    def store(self, index: int, value: int):
+        self._store(self.address + index * 8, value, _SEQ_CST)
+
+    def compare_exchange(self, index: int, expected: int, desired: int) -> bool:
+        expected_value = ctypes.c_int64(expected)
+        return self._compare_exchange(self.address + index * 8, ctypes.byref(expected_value), desired, _SEQ_CST, _SEQ_CST)
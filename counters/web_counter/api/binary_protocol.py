@@ -0,0 +1,166 @@
+import struct
+import asyncio
+import logging
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Frames, big-endian. Every frame starts with the length of the rest of it.
+#   request: u32 length | u8 op    | i64 argument | key (UTF-8, empty = default counter)
+#   reply:   u32 length | u16 status | i64 value  | error message (UTF-8, empty on success)
+# Status codes are the HTTP ones the same call gets from the HTTP API.
+LENGTH = struct.Struct(">I")
+REQUEST = struct.Struct(">Bq")
+REPLY = struct.Struct(">Hq")
+
+OP_INC = 1    # argument: delta >= 1; value: the new count
+OP_GET = 2    # value: the count
+OP_RESET = 3  # the key's counter, or the default counter for the empty key; value: 0
+
+MAX_FRAME = 64 * 1024
+READ_SIZE = 256 * 1024
+
+
+def encode_reply(status: int, value: int = 0, message: str = "") -> bytes:
+    payload = message.encode()
+    return LENGTH.pack(REPLY.size + len(payload)) + REPLY.pack(status, value) + payload
+
+
+class BinaryCounterServer:
+    """Length-prefixed binary protocol for INC, GET and RESET on a second port.
+
+    A connection may pipeline any number of requests. Everything that arrived
+    in one read is executed in order and answered with a single write. A run of
+    INCs on the same key inside that read becomes one storage call, whose result
+    is handed back as the count after each of them, as if they had been applied
+    back to back. Each worker listens with SO_REUSEPORT, so the kernel spreads
+    connections over the workers the same way uvicorn's socket does.
+    """
+
+    def __init__(self, counter, host: str, port: int, error_statuses: dict = None):
+        self.counter = counter
+        self.host = host
+        self.port = port
+        self.error_statuses = error_statuses or {}
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, reuse_port=True)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                requests, consumed = self._parse(buffer)
+                # The requests before a bad frame are answered first, in order.
+                replies = await self._execute(requests) if requests else []
+                if consumed < 0:
+                    replies.append(encode_reply(400, 0, f"Frame larger than {MAX_FRAME} bytes or shorter than a request"))
+                    writer.write(b"".join(replies))
+                    await writer.drain()
+                    break
+                del buffer[:consumed]
+                if replies:
+                    writer.write(b"".join(replies))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse(buffer: bytearray):
+        """Complete requests at the start of `buffer` and the bytes they take; -1 after the requests before a bad frame."""
+        requests = []
+        offset = 0
+        end = len(buffer)
+        while end - offset >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(buffer, offset)
+            if length < REQUEST.size or length > MAX_FRAME:
+                return requests, -1
+            frame_end = offset + LENGTH.size + length
+            if frame_end > end:
+                break
+            op, argument = REQUEST.unpack_from(buffer, offset + LENGTH.size)
+            key = bytes(buffer[offset + LENGTH.size + REQUEST.size:frame_end])
+            requests.append((op, argument, key))
+            offset = frame_end
+        return requests, offset
+
+    async def _execute(self, requests: list) -> list:
+        replies = []
+        index = 0
+        while index < len(requests):
+            op, argument, key = requests[index]
+            if op == OP_INC and argument >= 1:
+                # Extend the run of increments on this key.
+                deltas = [argument]
+                while index + len(deltas) < len(requests):
+                    next_op, next_argument, next_key = requests[index + len(deltas)]
+                    if next_op != OP_INC or next_key != key or next_argument < 1:
+                        break
+                    deltas.append(next_argument)
+                index += len(deltas)
+                try:
+                    count = await self._call(op, sum(deltas), key)
+                except Exception as e:
+                    replies.extend([self._error_reply(e)] * len(deltas))
+                    continue
+                # The count after each increment of the run, oldest first.
+                remaining = sum(deltas)
+                for delta in deltas:
+                    remaining -= delta
+                    replies.append(encode_reply(200, count - remaining))
+                continue
+            index += 1
+            try:
+                if op == OP_INC:
+                    replies.append(encode_reply(422, 0, f"Delta must be >= 1, got {argument}"))
+                elif op in (OP_GET, OP_RESET):
+                    value = await self._call(op, argument, key)
+                    replies.append(encode_reply(200, value))
+                else:
+                    replies.append(encode_reply(400, 0, f"Unknown op {op}"))
+            except Exception as e:
+                replies.append(self._error_reply(e))
+        return replies
+
+    async def _call(self, op: int, argument: int, raw_key: bytes) -> int:
+        counter = self.counter
+        if not raw_key:
+            if op == OP_INC:
+                return await counter._add(argument)
+            if op == OP_GET:
+                return await counter._read_value()
+            await counter._write_value(0)
+            return 0
+        try:
+            key = raw_key.decode()
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Key is not valid UTF-8")
+        counter._require_keyed()
+        if op == OP_INC:
+            return await counter._add_keyed(key, argument)
+        if op == OP_GET:
+            return await counter._read_keyed(key)
+        await counter._reset_keys([key])
+        return 0
+
+    def _error_reply(self, e: Exception) -> bytes:
+        if isinstance(e, HTTPException):
+            return encode_reply(e.status_code, 0, str(e.detail))
+        for cls, status in self.error_statuses.items():
+            if isinstance(e, cls):
+                return encode_reply(status, 0, str(e))
+        logger.error(f"Binary protocol request failed: {e}")
+        return encode_reply(500, 0, str(e))
@@ -0,0 +1,62 @@
+import asyncio
+
+
+class IncrementCoalescer:
+    """Merges the concurrent increments of one worker into single backend calls.
+
+    `apply(n)` is an async function that adds n to the counter and returns the
+    new value. At most one call is in flight. Requests that arrive while it
+    runs, or within `window_ms` of the first queued request, go out together in
+    the next call, up to `max_batch` requests per call (0 means no limit). Every
+    request is answered only after the call that carried it has returned, and
+    fails with that call's exception if it failed.
+    """
+
+    def __init__(self, apply, window_ms: float = 0.0, max_batch: int = 0):
+        self._apply = apply
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending = []
+        self._full = asyncio.Event()
+        self._flusher = None
+        self.calls = 0
+        self.coalesced = 0
+
+    async def add(self, delta: int = 1) -> int:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((future, delta))
+        if self.max_batch and len(self._pending) >= self.max_batch:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        while self._pending:
+            if self.window and not (self.max_batch and len(self._pending) >= self.max_batch):
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            if self.max_batch:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            else:
+                batch, self._pending = self._pending, []
+            total = sum(delta for _, delta in batch)
+            try:
+                value = await self._apply(total)
+            except Exception as e:
+                for future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.calls += 1
+            self.coalesced += len(batch)
+            # Hand out the values the batch passed through, in arrival order, so
+            # every request still sees its own count.
+            value -= total
+            for future, delta in batch:
+                value += delta
+                if not future.done():
+                    future.set_result(value)
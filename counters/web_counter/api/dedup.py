@@ -0,0 +1,144 @@
+import time
+import hashlib
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+from atomic_ops import AtomicWords
+from startup import startup_lock
+
+logger = logging.getLogger(__name__)
+
+# One 64-bit word per request id, so a million ids take 8 MiB:
+#   bits 62..25  fingerprint of the id (38 bits, never 0 for a live entry; bit 63 stays 0)
+#   bit  24      DONE: the increment was applied
+#   bits 23..0   claim time in TICK_MS ticks, modulo 2^24 (about 19 days)
+# A word of 0 was never used, so a lookup can stop there. A released claim
+# keeps its place with a zero fingerprint, and lookups continue past it.
+TICK_MS = 100
+_TICK_BITS = 24
+_TICK_MASK = (1 << _TICK_BITS) - 1
+_DONE = 1 << _TICK_BITS
+_FINGERPRINT_SHIFT = _TICK_BITS + 1
+_FINGERPRINT_MASK = (1 << 38) - 1
+_RELEASED = 1
+
+# Slots looked at per request id. A claim takes the first free or expired one,
+# and with all of them live, the oldest is evicted.
+PROBE_LENGTH = 16
+
+NEW = "new"
+DUPLICATE = "duplicate"
+IN_PROGRESS = "in_progress"
+
+
+class RequestInProgress(Exception):
+    pass
+
+
+def _tick() -> int:
+    # CLOCK_MONOTONIC is the same clock in every process of the host.
+    return (time.monotonic_ns() // (TICK_MS * 1_000_000)) & _TICK_MASK
+
+
+class RequestDedup:
+    """Time-windowed set of the request ids seen by all workers, in shared memory.
+
+    `claim(request_id)` decides atomically, across workers, whether a request
+    is new. A new one gets a claim that the caller completes once the increment
+    is applied, or releases if it failed so that a retry can apply it. A
+    repeat within `window_s` of the claim is a DUPLICATE once the claim is
+    complete, and IN_PROGRESS before that. Every update is one
+    compare-and-swap on the slot word, with no lock. The cache holds `slots`
+    ids; under pressure, the oldest id in a probe range is evicted, and a
+    repeat of an evicted id counts again.
+    """
+
+    def __init__(self, name: str, slots: int = 1 << 20, window_s: float = 60.0):
+        if slots < PROBE_LENGTH:
+            raise ValueError(f"Invalid DEDUP_SLOTS: {slots}")
+        self.window_ticks = int(window_s * 1000 / TICK_MS)
+        if not 0 < self.window_ticks < _TICK_MASK // 2:
+            raise ValueError(f"Invalid DEDUP_WINDOW_S: {window_s}")
+        self.name = name
+        self.slots = slots
+        self.window_s = window_s
+        with startup_lock(name):
+            try:
+                self._segment = shared_memory.SharedMemory(name=name, create=False)
+            except FileNotFoundError:
+                self._segment = shared_memory.SharedMemory(name=name, create=True, size=slots * 8)
+            try:
+                resource_tracker.unregister(self._segment._name, "shared_memory")
+            except Exception as e:
+                logger.debug(f"Could not unregister {name} from the resource tracker: {e}")
+        if self._segment.size < slots * 8:
+            raise RuntimeError(f"Shared memory {name} holds fewer than {slots} slots; remove /dev/shm/{name}")
+        self._words = AtomicWords(self._segment.buf)
+        self.duplicates = 0
+        self.conflicts = 0
+        self.evictions = 0
+
+    def _live(self, word: int, now: int) -> bool:
+        return (now - (word & _TICK_MASK)) & _TICK_MASK < self.window_ticks
+
+    def claim(self, request_id: str):
+        """(NEW, token), (DUPLICATE, None) or (IN_PROGRESS, None)."""
+        digest = int.from_bytes(hashlib.blake2b(request_id.encode(), digest_size=16).digest(), 'little')
+        fingerprint = (digest >> 64) & _FINGERPRINT_MASK or 1
+        start = digest % self.slots
+        words = self._words
+        while True:
+            now = _tick()
+            free = None
+            oldest = None
+            for probe in range(PROBE_LENGTH):
+                index = (start + probe) % self.slots
+                word = words.load(index)
+                if word == 0:
+                    if free is None:
+                        free = (index, word)
+                    break
+                if not self._live(word, now) or word >> _FINGERPRINT_SHIFT == 0:
+                    if free is None:
+                        free = (index, word)
+                    continue
+                if word >> _FINGERPRINT_SHIFT == fingerprint:
+                    if word & _DONE:
+                        self.duplicates += 1
+                        return DUPLICATE, None
+                    self.conflicts += 1
+                    return IN_PROGRESS, None
+                if oldest is None or (now - (word & _TICK_MASK)) & _TICK_MASK > (now - (oldest[1] & _TICK_MASK)) & _TICK_MASK:
+                    oldest = (index, word)
+            index, expected = free or oldest
+            claimed = fingerprint << _FINGERPRINT_SHIFT | now
+            # A failed swap means another worker took the slot meanwhile,
+            # possibly for this very id: look again.
+            if words.compare_exchange(index, expected, claimed):
+                if free is None:
+                    self.evictions += 1
+                return NEW, (index, claimed)
+
+    def complete(self, token):
+        index, claimed = token
+        # Fails only if the claim was evicted meanwhile; then nothing is left to mark.
+        self._words.compare_exchange(index, claimed, claimed | _DONE)
+
+    def release(self, token):
+        index, claimed = token
+        self._words.compare_exchange(index, claimed, _RELEASED)
+
+    async def run_once(self, request_id: str, apply) -> bool:
+        """Awaits `apply()` unless `request_id` was applied already; True for a duplicate."""
+        state, token = self.claim(request_id)
+        if state == DUPLICATE:
+            return True
+        if state == IN_PROGRESS:
+            raise RequestInProgress(f"Request {request_id} is still being applied")
+        try:
+            await apply()
+        except BaseException:
+            self.release(token)
+            raise
+        self.complete(token)
+        return False
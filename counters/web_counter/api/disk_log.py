@@ -0,0 +1,183 @@
+import os
+import time
+import fcntl
+import struct
+import logging
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Every record is 16 bytes: op, 3 pad bytes, signed 64-bit argument, CRC32 of
+# the first 12 bytes. A log starts with a HEADER record holding LOG_MAGIC, so a
+# file of another kind is never mistaken for a log. After the header, a torn or
+# partly written tail fails the CRC and is truncated on recovery.
+_BODY = struct.Struct('<B3xq')
+_CRC = struct.Struct('<I')
+RECORD_SIZE = _BODY.size + _CRC.size
+OP_ADD = 1
+OP_SET = 2
+OP_HEADER = 3
+LOG_MAGIC = 0x57434C4F47_000001  # "WCLOG", format version 1
+# A freshly compacted log: the header and one SET.
+CHECKPOINT_SIZE = 2 * RECORD_SIZE
+
+
+def encode_record(op: int, value: int) -> bytes:
+    body = _BODY.pack(op, value)
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def replay(data: bytes, value: int = 0):
+    """Apply the complete, valid records in `data`; returns (value, bytes consumed)."""
+    offset = 0
+    end = len(data) - len(data) % RECORD_SIZE
+    while offset < end:
+        body = data[offset:offset + _BODY.size]
+        (crc,) = _CRC.unpack_from(data, offset + _BODY.size)
+        if zlib.crc32(body) != crc:
+            break
+        op, argument = _BODY.unpack(body)
+        if op == OP_ADD:
+            value += argument
+        elif op == OP_SET:
+            value = argument
+        elif op != OP_HEADER or argument != LOG_MAGIC:
+            break
+        offset += RECORD_SIZE
+    return value, offset
+
+
+class AppendOnlyLog:
+    """Counter stored as a log of ADD/SET records shared by all workers.
+
+    Appends use O_APPEND under a shared flock on `<path>.lock`, so workers append
+    concurrently. Compaction replaces the log with a header and a single SET
+    record under the exclusive lock, once the log passes `compact_bytes` and
+    every `compact_interval_s` seconds. Every worker tails the log from its last
+    offset to answer reads, and starts over when compaction has swapped the file.
+    """
+
+    def __init__(self, path: str, compact_bytes: int = 4 * 1024 * 1024, compact_interval_s: float = 60.0):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.compact_interval_s = compact_interval_s
+        self._last_compact = time.monotonic()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        # Tail state, shared by the group-commit thread and /count threads.
+        self._state_lock = threading.Lock()
+        self._inode = None
+        self._offset = 0
+        self._value = 0
+
+    def _flock(self, operation):
+        fcntl.flock(self._lock_fd, operation)
+
+    def recover(self) -> int:
+        """Replay the log, cutting off a torn tail left by a crash mid-append.
+
+        An empty file becomes a new log. A file that does not start with a
+        valid header is refused rather than truncated, since it is most likely
+        the counter of another disk engine.
+        """
+        self._flock(fcntl.LOCK_EX)
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            if not data:
+                self._replace_log(0)
+                data = encode_record(OP_HEADER, LOG_MAGIC) + encode_record(OP_SET, 0)
+            elif data[:RECORD_SIZE] != encode_record(OP_HEADER, LOG_MAGIC):
+                raise RuntimeError(
+                    f"{self.path} is not a counter log ({len(data)} bytes without a log header); "
+                    f"move it away or use the disk engine that wrote it"
+                )
+            value, valid = replay(data)
+            if valid < len(data):
+                logger.warning(f"Truncating {len(data) - valid} bytes of torn log tail in {self.path}")
+                os.truncate(self.path, valid)
+                os.fsync(self._fd)
+            with self._state_lock:
+                self._inode = os.fstat(self._fd).st_ino
+                self._offset = valid
+                self._value = value
+            logger.info(f"Recovered counter {value} from {valid // RECORD_SIZE} log records in {self.path}")
+            return value
+        finally:
+            self._flock(fcntl.LOCK_UN)
+
+    def _reopen_if_replaced(self):
+        if os.fstat(self._fd).st_ino != os.stat(self.path).st_ino:
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _tail(self) -> int:
+        with self._state_lock:
+            with open(self.path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    self._inode, self._offset, self._value = inode, 0, 0
+                f.seek(self._offset)
+                data = f.read()
+            # A record another worker is still writing is left for the next read.
+            self._value, consumed = replay(data, self._value)
+            self._offset += consumed
+            return self._value
+
+    def append(self, op: int, value: int) -> int:
+        """Append one record and fsync it; returns the counter after the append."""
+        self._flock(fcntl.LOCK_SH)
+        try:
+            self._reopen_if_replaced()
+            os.write(self._fd, encode_record(op, value))
+            os.fsync(self._fd)
+            current = self._tail()
+            size = os.fstat(self._fd).st_size
+        finally:
+            self._flock(fcntl.LOCK_UN)
+        if size > self.compact_bytes:
+            self.compact(self.compact_bytes)
+        elif self.compact_interval_s and time.monotonic() - self._last_compact >= self.compact_interval_s:
+            self.compact(CHECKPOINT_SIZE)
+        return current
+
+    def read(self) -> int:
+        self._flock(fcntl.LOCK_SH)
+        try:
+            return self._tail()
+        finally:
+            self._flock(fcntl.LOCK_UN)
+
+    def compact(self, min_size: int = CHECKPOINT_SIZE):
+        """Checkpoint: atomically replace the log with one SET of the current value, if it is over `min_size` bytes."""
+        self._flock(fcntl.LOCK_EX)
+        try:
+            self._last_compact = time.monotonic()
+            self._reopen_if_replaced()
+            if os.fstat(self._fd).st_size <= min_size:
+                return  # Another worker compacted while we waited for the lock.
+            value = self._tail()
+            self._replace_log(value)
+            logger.info(f"Compacted {self.path} to a checkpoint of {value}")
+        finally:
+            self._flock(fcntl.LOCK_UN)
+
+    def _replace_log(self, value: int):
+        # Called under the exclusive lock. The header and the SET reach the log
+        # together through the rename, so a crash never leaves a headerless file.
+        tmp_path = f"{self.path}.compact"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, encode_record(OP_HEADER, LOG_MAGIC) + encode_record(OP_SET, value))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, self.path)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._reopen_if_replaced()
+
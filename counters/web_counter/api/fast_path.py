@@ -0,0 +1,134 @@
+import time
+
+from metrics import ENDPOINTS
+
+_INC = ENDPOINTS.index("inc")
+_COUNT = ENDPOINTS.index("count")
+_RESET = ENDPOINTS.index("reset")
+
+# Bodies and header lists are built once. The bytes match what FastAPI sends
+# for the same routes: JSONResponse renders compact JSON with no spaces.
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+_OK_BODY = b'{"status":"ok"}'
+_OK_START = {
+    "type": "http.response.start",
+    "status": 200,
+    "headers": _JSON_HEADERS + [(b"content-length", str(len(_OK_BODY)).encode())],
+}
+_OK_BODY_MESSAGE = {"type": "http.response.body", "body": _OK_BODY}
+_DUPLICATE_BODY = b'{"status":"ok","duplicate":true}'
+_DUPLICATE_START = {
+    "type": "http.response.start",
+    "status": 200,
+    "headers": _JSON_HEADERS + [(b"content-length", str(len(_DUPLICATE_BODY)).encode())],
+}
+_DUPLICATE_BODY_MESSAGE = {"type": "http.response.body", "body": _DUPLICATE_BODY}
+
+
+class FastPathApp:
+    """Raw ASGI callable that serves POST /inc, GET /count and POST /reset itself.
+
+    Everything else goes to the FastAPI app unchanged, and so does any of these
+    requests with input the fast path does not parse: a query string other than
+    `by=<positive integer>`, or a /reset body. Storage errors go through the
+    exception handlers registered on the FastAPI app, so the responses are the
+    same as those of the routes. An Idempotency-Key header on /inc goes
+    through the same dedup cache as the route. Requests served here are recorded in
+    WorkerMetrics directly, since they never reach MetricsMiddleware.
+    """
+
+    def __init__(self, app, counter, metrics=None):
+        self.app = app
+        self.counter = counter
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            method = scope["method"]
+            if path == "/inc" and method == "POST":
+                delta = _parse_by(scope["query_string"])
+                if delta:
+                    await self._serve(self._inc, (delta, _idempotency_key(scope["headers"])), _INC, scope, receive, send)
+                    return
+            elif path == "/count" and method == "GET":
+                await self._serve(self._count, None, _COUNT, scope, receive, send)
+                return
+            elif path == "/reset" and method == "POST" and not _has_body(scope["headers"]):
+                await self._serve(self._reset, None, _RESET, scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    async def _serve(self, handler, argument, endpoint: int, scope, receive, send):
+        started = time.perf_counter_ns()
+        status = 500
+        try:
+            await handler(argument, send)
+            status = 200
+        except Exception as exc:
+            status = await self._handle_error(exc, scope, receive, send)
+        finally:
+            if self.metrics is not None:
+                self.metrics.record(endpoint, time.perf_counter_ns() - started, status >= 400)
+
+    async def _inc(self, argument, send):
+        delta, request_id = argument
+        if request_id is None:
+            await self.counter._add(delta)
+        elif await self.counter._add_once(request_id, lambda: self.counter._add(delta)):
+            await send(_DUPLICATE_START)
+            await send(_DUPLICATE_BODY_MESSAGE)
+            return
+        await send(_OK_START)
+        await send(_OK_BODY_MESSAGE)
+
+    async def _count(self, _, send):
+        body = b'{"count":%d}' % await self.counter._read_value()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": _JSON_HEADERS + [(b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _reset(self, _, send):
+        await self.counter._write_value(0)
+        await send(_OK_START)
+        await send(_OK_BODY_MESSAGE)
+
+    async def _handle_error(self, exc: Exception, scope, receive, send) -> int:
+        # Same lookup as Starlette's ExceptionMiddleware: the closest registered
+        # base class wins. Unhandled errors propagate and uvicorn answers 500.
+        handlers = self.app.exception_handlers
+        for cls in type(exc).__mro__:
+            if cls in handlers:
+                from starlette.requests import Request
+                response = await handlers[cls](Request(scope, receive), exc)
+                await response(scope, receive, send)
+                return response.status_code
+        raise exc
+
+
+def _parse_by(query_string: bytes) -> int:
+    """The `by` of /inc, or 0 when FastAPI has to parse the query string."""
+    if not query_string:
+        return 1
+    if query_string.startswith(b"by=") and query_string[3:].isdigit():
+        return int(query_string[3:])
+    return 0
+
+
+def _idempotency_key(headers):
+    for name, value in headers:
+        if name == b"idempotency-key":
+            return value.decode("latin-1")
+    return None
+
+
+def _has_body(headers) -> bool:
+    for name, value in headers:
+        if name == b"content-length":
+            return value != b"0"
+        if name == b"transfer-encoding":
+            return True
+    return False
@@ -0,0 +1,211 @@
+import os
+import time
+import fcntl
+import atexit
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+from startup import process_alive
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ("inc", "inc_key", "inc_batch", "count", "count_key", "reset", "metrics", "other")
+_EXACT_PATHS = {"/inc": "inc", "/inc/batch": "inc_batch", "/count": "count", "/reset": "reset", "/metrics": "metrics"}
+
+# Latency bucket upper bounds in nanoseconds, exported in seconds.
+BUCKETS_NS = (
+    50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000,
+    10_000_000, 25_000_000, 50_000_000, 100_000_000, 250_000_000, 1_000_000_000,
+)
+
+# Monotonic counters that other components keep in plain Python attributes,
+# copied into the worker's region once a second: (metric name, help).
+SOURCE_COUNTERS = (
+    ("coalescer_calls_total", "Backend calls made by the increment coalescer."),
+    ("coalescer_increments_total", "Increments carried by those calls."),
+    ("pg_pool_checkouts_total", "Connections checked out of the PostgreSQL pool."),
+    ("pg_pool_waits_total", "Checkouts that had to wait for a connection."),
+    ("pg_pool_wait_seconds_total", "Time spent waiting for a pooled connection."),
+    ("pg_pool_timeouts_total", "Checkouts that gave up waiting."),
+    ("dedup_duplicates_total", "Increments skipped because their idempotency key was already applied."),
+    ("dedup_conflicts_total", "Repeats of an idempotency key whose first request was still being applied."),
+    ("dedup_evictions_total", "Idempotency keys evicted from a full cache before their window ended."),
+)
+
+# Region layout, in 8-byte words: owner pid, increments, the source counters,
+# then for every endpoint: requests, errors, duration sum (ns), one word per bucket.
+_OWNER = 0
+_INCREMENTS = 1
+_SOURCES = 2
+_SERIES = _SOURCES + len(SOURCE_COUNTERS)
+_SERIES_WORDS = 3 + len(BUCKETS_NS)
+REGION_WORDS = _SERIES + len(ENDPOINTS) * _SERIES_WORDS
+
+
+def endpoint_of(path: str) -> str:
+    endpoint = _EXACT_PATHS.get(path)
+    if endpoint is not None:
+        return endpoint
+    if path.startswith("/inc/"):
+        return "inc_key"
+    if path.startswith("/count/"):
+        return "count_key"
+    return "other"
+
+
+class WorkerMetrics:
+    """Request counters and latency histograms shared by all workers.
+
+    Every worker owns one region of the `name` segment and is its only
+    writer: all updates come from the worker's event loop, so they are plain
+    stores with no lock and no atomic instruction. /metrics, answered by any
+    worker, sums the regions. Regions of exited workers are taken over and
+    keep their values, so the totals never go backwards.
+    """
+
+    def __init__(self, name: str, slots: int = 64, lock_path: str = None):
+        self.name = name
+        self.slots = slots
+        self.lock_path = lock_path or f"/tmp/{name}.lock"
+        size = slots * REGION_WORDS * 8
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    self._segment = shared_memory.SharedMemory(name=name, create=False)
+                except FileNotFoundError:
+                    self._segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+                try:
+                    resource_tracker.unregister(self._segment._name, "shared_memory")
+                except Exception as e:
+                    logger.debug(f"Could not unregister {name} from the resource tracker: {e}")
+                if self._segment.size < size:
+                    raise RuntimeError(f"Shared memory {name} is too small for {slots} metrics slots; remove /dev/shm/{name}")
+                self._words = self._segment.buf.cast('q')
+                self.slot = self._claim()
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        self._base = self.slot * REGION_WORDS
+        self._sources = []
+        self._source_names = set()
+        # The cast view must be released before the segment is closed, or
+        # SharedMemory.__del__ raises BufferError at interpreter exit.
+        atexit.register(self.close)
+
+    def _claim(self) -> int:
+        pid = os.getpid()
+        for slot in range(self.slots):
+            owner = self._words[slot * REGION_WORDS + _OWNER]
+            if owner == pid or not owner or not process_alive(owner):
+                self._words[slot * REGION_WORDS + _OWNER] = pid
+                return slot
+        raise RuntimeError(f"All {self.slots} metrics slots are owned by live processes; raise METRICS_SLOTS")
+
+    def record(self, endpoint: int, duration_ns: int, error: bool):
+        words = self._words
+        base = self._base + _SERIES + endpoint * _SERIES_WORDS
+        words[base] += 1
+        if error:
+            words[base + 1] += 1
+        words[base + 2] += duration_ns
+        for index, bound in enumerate(BUCKETS_NS):
+            if duration_ns <= bound:
+                words[base + 3 + index] += 1
+                break
+
+    def add_increments(self, delta: int):
+        self._words[self._base + _INCREMENTS] += delta
+
+    def add_source(self, collect):
+        """`collect()` returns {source counter name: cumulative value} for this worker."""
+        self._sources.append(collect)
+        self._source_names.update(collect())
+
+    def refresh_sources(self):
+        names = [name for name, _ in SOURCE_COUNTERS]
+        for collect in self._sources:
+            for name, value in collect().items():
+                self._words[self._base + _SOURCES + names.index(name)] = int(value)
+
+    def _sum(self, offset: int) -> int:
+        words = self._words
+        return sum(words[slot * REGION_WORDS + offset] for slot in range(self.slots))
+
+    def render(self, labels: dict) -> str:
+        """All workers' metrics in the Prometheus text exposition format."""
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        words = self._words
+        regions = [slot * REGION_WORDS for slot in range(self.slots) if words[slot * REGION_WORDS + _OWNER]]
+        lines = [
+            "# HELP web_counter_workers Worker processes that have reported metrics.",
+            "# TYPE web_counter_workers gauge",
+            f"web_counter_workers{{{label_text}}} {sum(1 for base in regions if process_alive(words[base + _OWNER]))}",
+            "# HELP web_counter_increments_total Increments applied to the counters.",
+            "# TYPE web_counter_increments_total counter",
+            f"web_counter_increments_total{{{label_text}}} {self._sum(_INCREMENTS)}",
+        ]
+        for index, (name, help_text) in enumerate(SOURCE_COUNTERS):
+            if name not in self._source_names:
+                continue
+            value = self._sum(_SOURCES + index)
+            if name == "pg_pool_wait_seconds_total":
+                value = value / 1e9
+            lines += [f"# HELP web_counter_{name} {help_text}", f"# TYPE web_counter_{name} counter", f"web_counter_{name}{{{label_text}}} {value}"]
+
+        series = []
+        for index, endpoint in enumerate(ENDPOINTS):
+            offset = _SERIES + index * _SERIES_WORDS
+            totals = [sum(words[base + offset + i] for base in regions) for i in range(_SERIES_WORDS)]
+            if totals[0]:
+                series.append((f'{label_text},endpoint="{endpoint}"', totals))
+        lines += ["# HELP web_counter_requests_total Requests handled, by endpoint.", "# TYPE web_counter_requests_total counter"]
+        lines += [f"web_counter_requests_total{{{labels_}}} {totals[0]}" for labels_, totals in series]
+        lines += ["# HELP web_counter_request_errors_total Requests answered with a 4xx or 5xx status.", "# TYPE web_counter_request_errors_total counter"]
+        lines += [f"web_counter_request_errors_total{{{labels_}}} {totals[1]}" for labels_, totals in series]
+        lines += ["# HELP web_counter_request_duration_seconds Request latency, by endpoint.", "# TYPE web_counter_request_duration_seconds histogram"]
+        for labels_, totals in series:
+            cumulative = 0
+            for bound, count in zip(BUCKETS_NS, totals[3:]):
+                cumulative += count
+                lines.append(f'web_counter_request_duration_seconds_bucket{{{labels_},le="{bound / 1e9:g}"}} {cumulative}')
+            lines.append(f'web_counter_request_duration_seconds_bucket{{{labels_},le="+Inf"}} {totals[0]}')
+            lines.append(f"web_counter_request_duration_seconds_sum{{{labels_}}} {totals[2] / 1e9}")
+            lines.append(f"web_counter_request_duration_seconds_count{{{labels_}}} {totals[0]}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self._words is not None:
+            self._words.release()
+            self._words = None
+            self._segment.close()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request into WorkerMetrics."""
+
+    def __init__(self, app, metrics: WorkerMetrics):
+        self.app = app
+        self.metrics = metrics
+        self._endpoint_index = {endpoint: index for index, endpoint in enumerate(ENDPOINTS)}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter_ns()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.record(
+                self._endpoint_index[endpoint_of(scope["path"])],
+                time.perf_counter_ns() - started,
+                status >= 400,
+            )
@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _WaitMetrics:
+    # Wait-time metrics, read by the /pool/stats endpoint.
+    def _init_metrics(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_ns_total = 0
+        self.wait_ns_max = 0
+        self.timeouts = 0
+        self.replaced = 0
+
+    def _record_wait(self, wait_ns: int, waited: bool):
+        self.checkouts += 1
+        self.wait_ns_total += wait_ns
+        if waited:
+            self.waits += 1
+        if wait_ns > self.wait_ns_max:
+            self.wait_ns_max = wait_ns
+
+    def _metrics(self, open_connections: int, idle: int) -> dict:
+        return {
+            "pid": os.getpid(),
+            "size": self.size,
+            "open": open_connections,
+            "idle": idle,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_ms_total": self.wait_ns_total / 1e6,
+            "wait_ms_mean": self.wait_ns_total / self.checkouts / 1e6 if self.checkouts else 0.0,
+            "wait_ms_max": self.wait_ns_max / 1e6,
+            "timeouts": self.timeouts,
+            "replaced": self.replaced,
+        }
+
+
+class ConnectionPool(_WaitMetrics):
+    """Bounded, blocking connection pool shared by the threads of one worker.
+
+    At most `size` connections exist at once. A thread that finds none idle
+    waits up to `timeout` seconds for one to be returned. A connection that was
+    idle for longer than `health_check_after` seconds is checked with SELECT 1
+    before it is handed out, and a broken one is replaced by a new connection.
+    """
+
+    def __init__(self, connect, size: int = 10, timeout: float = 30.0, health_check_after: float = 30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._open = 0
+        self._condition = threading.Condition()
+        self._init_metrics()
+
+    def _acquire(self):
+        started = time.perf_counter_ns()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._condition:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn, returned_at = None, None
+                    break
+                waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    if not self._idle and self._open >= self.size:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"No database connection available within {self.timeout}s (pool size {self.size})")
+            self._record_wait(time.perf_counter_ns() - started, waited)
+
+        try:
+            if conn is None:
+                return self._connect()
+            if conn.closed or time.monotonic() - returned_at > self.health_check_after and not self._is_healthy(conn):
+                self._close_quietly(conn)
+                self.replaced += 1
+                return self._connect()
+            return conn
+        except Exception:
+            self._discard()
+            raise
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check, reconnecting: {e}")
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _release(self, conn):
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def _discard(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            # Roll back whatever the caller left open. If that fails, or the
+            # driver marked the connection closed, it does not go back to the pool.
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except Exception:
+                pass
+            if conn.closed:
+                self._discard()
+            else:
+                self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return self._metrics(self._open, len(self._idle))
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+class AsyncConnectionPool(_WaitMetrics):
+    """asyncpg pool with the same size, timeout, health-check and wait metrics.
+
+    Queries run on the event loop, so there is no thread hop per request. A
+    connection idle for longer than `health_check_after` seconds gets a
+    SELECT 1 before use; if that fails it is terminated and another one is
+    acquired. asyncpg itself drops connections that broke during a query.
+    """
+
+    def __init__(self, connect_kwargs: dict, size: int = 10, timeout: float = 30.0, health_check_after: float = 30.0):
+        self.connect_kwargs = connect_kwargs
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._pool = None
+        self._returned_at = {}
+        self._init_metrics()
+
+    async def open(self):
+        import asyncpg
+        self._pool = await asyncpg.create_pool(min_size=1, max_size=self.size, **self.connect_kwargs)
+
+    async def _acquire(self):
+        started = time.perf_counter_ns()
+        waited = self._pool.get_idle_size() == 0 and self._pool.get_size() >= self.size
+        try:
+            conn = await self._pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s (pool size {self.size})")
+        self._record_wait(time.perf_counter_ns() - started, waited)
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self._acquire()
+        # asyncpg hands out a new proxy per acquire; the backend pid identifies the connection.
+        returned_at = self._returned_at.pop(conn.get_server_pid(), None)
+        if returned_at is not None and time.monotonic() - returned_at > self.health_check_after:
+            try:
+                await conn.fetchval("SELECT 1")
+            except Exception as e:
+                logger.warning(f"Pooled connection failed health check, reconnecting: {e}")
+                conn.terminate()
+                await self._pool.release(conn)
+                self.replaced += 1
+                conn = await self._acquire()
+        try:
+            yield conn
+        finally:
+            self._returned_at[conn.get_server_pid()] = time.monotonic()
+            await self._pool.release(conn)
+
+    def stats(self) -> dict:
+        if self._pool is None:
+            return self._metrics(0, 0)
+        return self._metrics(self._pool.get_size(), self._pool.get_idle_size())
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
@@ -0,0 +1,459 @@
+import os
+import time
+import fcntl
+import struct
+import hashlib
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+from atomic_ops import AtomicWords
+
+logger = logging.getLogger(__name__)
+
+# Control segment `<name>`: magic, generation of the current table.
+# Table segment `<name>_<generation>`: an 8-word header, then `capacity` slots
+# of two words each, (key hash, counter). Slots are claimed with a
+# compare-and-swap on the key word and never freed, so linear probing needs no
+# tombstones.
+MAGIC = 0x57434854  # "WCHT"
+CONTROL_WORDS = 8
+CTRL_MAGIC, CTRL_GENERATION = 0, 1
+HEADER_WORDS = 8
+HDR_MAGIC, HDR_CAPACITY, HDR_USED, HDR_NEXT, HDR_STATE, HDR_RESERVED = 0, 1, 2, 3, 4, 5
+ACTIVE, MIGRATING, MIGRATED = 0, 1, 2
+
+# Key words: 0 is a free slot, -1 a free slot sealed by a resize.
+EMPTY = 0
+SEALED_EMPTY = -1
+# Counter words carry two flags above a 61-bit value. A resize seals every
+# slot before copying it to the next table, so no increment can land in a slot
+# that was already copied.
+SEALED = 1 << 62
+COPIED = 1 << 61
+VALUE_MASK = COPIED - 1
+
+# How long an operation waits for a slot that is being copied before it
+# checks whether the resizing process died.
+STALL_TIMEOUT = 1.0
+
+_SNAPSHOT_HEADER = struct.Struct('<4sIQ')
+_SNAPSHOT_ENTRY = struct.Struct('<qq')
+_SNAPSHOT_MAGIC = b"WCHT"
+
+
+class TableFull(Exception):
+    pass
+
+
+class WouldBlock(Exception):
+    """Raised with wait=False where the operation would wait for a resize; nothing was changed."""
+
+
+def key_hash(key: str) -> int:
+    """Stable signed 64-bit hash of a key, the same in every worker process."""
+    h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little', signed=True)
+    return h if h not in (EMPTY, SEALED_EMPTY) else 1
+
+
+class _SegmentLock:
+    """Serializes opening segments across workers.
+
+    The resource tracker would unlink a segment when the process that created
+    or attached to it exits, so every open is followed by an unregister. The
+    workers share one tracker, which keeps a set of names: two workers that
+    attach at once would both register the name once and unregister it twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+
+
+def _open_segment(lock: _SegmentLock, name: str, size: int = 0):
+    with lock:
+        segment = shared_memory.SharedMemory(name=name, create=bool(size), size=size)
+        try:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        except Exception as e:
+            logger.debug(f"Could not unregister {name} from the resource tracker: {e}")
+    return segment
+
+
+def _unlink_segment(lock: _SegmentLock, segment):
+    with lock:
+        # unlink() unregisters the name again, so the tracker has to know it.
+        resource_tracker.register(segment._name, "shared_memory")
+        segment.unlink()
+
+
+class _Table:
+    def __init__(self, segment, generation: int):
+        self.segment = segment
+        self.generation = generation
+        self.words = AtomicWords(segment.buf)
+        self.capacity = self.words.load(HDR_CAPACITY)
+
+    @classmethod
+    def create(cls, lock: _SegmentLock, name: str, generation: int, capacity: int):
+        segment_name = f"{name}_{generation}"
+        size = (HEADER_WORDS + 2 * capacity) * 8
+        try:
+            segment = _open_segment(lock, segment_name, size)
+        except FileExistsError:
+            # Left over by a resize that died before publishing it.
+            _unlink_segment(lock, _open_segment(lock, segment_name))
+            segment = _open_segment(lock, segment_name, size)
+        struct.pack_into('<qq', segment.buf, HDR_MAGIC * 8, MAGIC, capacity)
+        return cls(segment, generation)
+
+    @classmethod
+    def attach(cls, lock: _SegmentLock, name: str, generation: int):
+        table = cls(_open_segment(lock, f"{name}_{generation}"), generation)
+        if table.words.load(HDR_MAGIC) != MAGIC:
+            raise RuntimeError(f"Shared memory {name}_{generation} is not a counter table")
+        return table
+
+
+class SharedHashTable:
+    """Open-addressing hash table of int64 counters shared by all workers.
+
+    Inserts and increments are lock-free compare-and-swaps on the shared
+    segment. In `grow` mode a table filled past `max_load` is copied into a
+    new segment of twice the capacity while the other workers keep counting;
+    in `fixed` mode a full table raises TableFull. Keys are stored as 64-bit
+    hashes only, so two keys with the same hash share a counter.
+    """
+
+    hash_key = staticmethod(key_hash)
+
+    def __init__(self, name: str, capacity: int = 1 << 20, mode: str = "grow", max_load: float = 0.7, lock_path: str = None):
+        if mode not in ("grow", "fixed"):
+            raise ValueError(f"Invalid table mode: {mode}")
+        if not 0.0 < max_load <= 1.0:
+            raise ValueError(f"Invalid max load: {max_load}")
+        self.name = name
+        self.initial_capacity = capacity
+        self.growable = mode == "grow"
+        self.max_load = max_load
+        self.lock_path = lock_path or f"/tmp/{name}.lock"
+        self._segment_lock = _SegmentLock(f"{self.lock_path}.segments")
+        self._control_segment = None
+        self._control = None
+        self._tables = {}
+        self._root = None
+
+    def _flock(self, operation=fcntl.LOCK_EX):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    @staticmethod
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def open(self, snapshot_path: str = None) -> bool:
+        """Attach to the table, creating it (from the snapshot, if one exists) when absent.
+
+        Returns whether this call created the table.
+        """
+        fd = self._flock()
+        try:
+            try:
+                self._control_segment = _open_segment(self._segment_lock, self.name)
+                created = False
+            except FileNotFoundError:
+                entries = self._read_snapshot(snapshot_path) if snapshot_path and os.path.exists(snapshot_path) else []
+                capacity = self.initial_capacity
+                if self.growable:
+                    while len(entries) > capacity * self.max_load:
+                        capacity *= 2
+                elif len(entries) > capacity:
+                    raise TableFull(f"Snapshot {snapshot_path} holds {len(entries)} counters, the table only {capacity}")
+                table = _Table.create(self._segment_lock, self.name, 1, capacity)
+                for h, value in entries:
+                    table.words.store(self._slot(table, h, insert=True), value)
+                self._control_segment = _open_segment(self._segment_lock, self.name, CONTROL_WORDS * 8)
+                struct.pack_into('<qq', self._control_segment.buf, 0, MAGIC, 1)
+                self._tables[1] = table
+                if entries:
+                    logger.info(f"Restored {len(entries)} counters from {snapshot_path}")
+                created = True
+            self._control = AtomicWords(self._control_segment.buf)
+            self._root = self._table(self._control.load(CTRL_GENERATION))
+        finally:
+            self._unlock(fd)
+        return created
+
+    def _table(self, generation: int) -> _Table:
+        table = self._tables.get(generation)
+        if table is None:
+            table = self._tables[generation] = _Table.attach(self._segment_lock, self.name, generation)
+        return table
+
+    def _next(self, table: _Table) -> _Table:
+        try:
+            following = self._table(table.words.load(HDR_NEXT))
+        except FileNotFoundError:
+            # Grown again and unlinked since: the current generation holds everything.
+            self._root = self._table(self._control.load(CTRL_GENERATION))
+            return self._root
+        # Old generations stay mapped until close(): another thread of this
+        # process may still be probing them.
+        if table is self._root and table.words.load(HDR_STATE) == MIGRATED:
+            self._root = following
+        return following
+
+    def _slot(self, table: _Table, h: int, insert: bool, copying: bool = False):
+        """Index of the counter word for `h` in `table`, None if absent, -1 if sealed."""
+        words = table.words
+        capacity = table.capacity
+        index = h % capacity
+        for _ in range(capacity):
+            key_word = HEADER_WORDS + 2 * index
+            k = words.load(key_word)
+            if k == EMPTY:
+                if not insert:
+                    return None
+                # While a resize copies into this table, new keys leave room for the copies.
+                reserved = 0 if copying else words.load(HDR_RESERVED)
+                if reserved and words.load(HDR_USED) >= capacity - reserved:
+                    raise TableFull(f"Counter table {self.name} is full until the running resize finishes")
+                if words.compare_exchange(key_word, EMPTY, h):
+                    words.fetch_add(HDR_USED, 1)
+                    return key_word + 1
+                k = words.load(key_word)
+            if k == h:
+                return key_word + 1
+            if k == SEALED_EMPTY:
+                return -1
+            index = index + 1 if index + 1 < capacity else 0
+        if not insert:
+            return None
+        if words.load(HDR_STATE) != ACTIVE:
+            return -1  # Full, but being copied into the next table.
+        raise TableFull(f"Counter table {self.name} is full ({capacity} keys)")
+
+    def _wait_copied(self, table: _Table, word: int):
+        deadline = time.monotonic() + STALL_TIMEOUT
+        while not table.words.load(word) & COPIED:
+            if time.monotonic() > deadline:
+                # The lock is free only if the process that was resizing died.
+                fd = self._flock(fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if fd is not None:
+                    try:
+                        logger.warning(f"Resuming the interrupted resize of {self.name}")
+                        self._grow_locked()
+                    finally:
+                        self._unlock(fd)
+                deadline = time.monotonic() + STALL_TIMEOUT
+            time.sleep(0)
+
+    def _insert(self, table: _Table, h: int, wait: bool):
+        """(table, counter word) for `h`, inserting it if absent; word -1 if sealed."""
+        while True:
+            try:
+                return table, self._slot(table, h, insert=True)
+            except TableFull:
+                if not self.growable:
+                    raise
+                # Only when inserts outran the background resize: wait for it.
+                if not wait:
+                    raise WouldBlock(f"Counter table {self.name} is full until the running resize finishes")
+                self.grow()
+                table = self._root
+
+    def _wait_or_raise(self, table: _Table, word: int, wait: bool):
+        if not wait:
+            raise WouldBlock(f"Counter of table {self.name} is being copied by a resize")
+        self._wait_copied(table, word)
+
+    # With wait=False, add, get and set never block: where they would wait for a
+    # resize (a full table, or a slot being copied), they raise WouldBlock
+    # instead, so an event loop can retry them on a thread.
+
+    def add(self, h: int, delta: int = 1, wait: bool = True) -> int:
+        table = self._root
+        while True:
+            table, word = self._insert(table, h, wait)
+            if word != -1:
+                words = table.words
+                while True:
+                    value = words.load(word)
+                    if value & SEALED:
+                        self._wait_or_raise(table, word, wait)
+                        break
+                    if words.compare_exchange(word, value, value + delta):
+                        return value + delta
+            table = self._next(table)
+
+    def get(self, h: int, wait: bool = True) -> int:
+        table = self._root
+        while True:
+            word = self._slot(table, h, insert=False)
+            if word is None:
+                return 0
+            if word != -1:
+                value = table.words.load(word)
+                if not value & SEALED:
+                    return value
+                self._wait_or_raise(table, word, wait)
+            table = self._next(table)
+
+    def set(self, h: int, new_value: int, wait: bool = True):
+        table = self._root
+        while True:
+            table, word = self._insert(table, h, wait)
+            if word != -1:
+                words = table.words
+                while True:
+                    value = words.load(word)
+                    if value & SEALED:
+                        self._wait_or_raise(table, word, wait)
+                        break
+                    if words.compare_exchange(word, value, new_value):
+                        return
+            table = self._next(table)
+
+    def needs_growth(self) -> bool:
+        words = self._root.words
+        return self.growable and words.load(HDR_USED) > self._root.capacity * self.max_load and words.load(HDR_STATE) == ACTIVE
+
+    def grow(self) -> bool:
+        """Copy the table into one of twice the capacity; blocks until done."""
+        fd = self._flock()
+        try:
+            grown = self._grow_locked()
+            self._root = self._table(self._control.load(CTRL_GENERATION))
+            return grown
+        finally:
+            self._unlock(fd)
+
+    def _grow_locked(self) -> bool:
+        old = self._table(self._control.load(CTRL_GENERATION))
+        state = old.words.load(HDR_STATE)
+        if state == ACTIVE:
+            if old.words.load(HDR_USED) <= old.capacity * self.max_load:
+                return False  # Another worker grew the table while we waited for the lock.
+            new = _Table.create(self._segment_lock, self.name, old.generation + 1, old.capacity * 2)
+            new.words.store(HDR_RESERVED, old.capacity)
+            self._tables[new.generation] = new
+            old.words.store(HDR_NEXT, new.generation)
+            old.words.store(HDR_STATE, MIGRATING)
+        else:
+            new = self._table(old.words.load(HDR_NEXT))  # Resuming a resize that died midway.
+        started = time.perf_counter()
+        self._migrate(old, new)
+        new.words.store(HDR_RESERVED, 0)
+        self._control.store(CTRL_GENERATION, new.generation)
+        old.words.store(HDR_STATE, MIGRATED)
+        self._root = new
+        _unlink_segment(self._segment_lock, old.segment)
+        logger.info(
+            f"Grew counter table {self.name} to {new.capacity} slots "
+            f"({new.words.load(HDR_USED)} keys) in {time.perf_counter() - started:.2f}s"
+        )
+        return True
+
+    def _migrate(self, old: _Table, new: _Table):
+        # Each slot is sealed, copied, then marked copied. Operations that hit a
+        # sealed slot wait for the copy and continue in the new table, so only
+        # the resize writes a copied key there until it is marked, and storing
+        # (not adding) the value keeps a resumed resize exact.
+        words = old.words
+        for index in range(old.capacity):
+            key_word = HEADER_WORDS + 2 * index
+            k = words.load(key_word)
+            while k == EMPTY:
+                if words.compare_exchange(key_word, EMPTY, SEALED_EMPTY):
+                    break
+                k = words.load(key_word)
+            if k in (EMPTY, SEALED_EMPTY):
+                continue
+            word = key_word + 1
+            value = words.load(word)
+            while not value & SEALED:
+                if words.compare_exchange(word, value, value | SEALED):
+                    value |= SEALED
+                    break
+                value = words.load(word)
+            if value & COPIED:
+                continue
+            new.words.store(self._slot(new, k, insert=True, copying=True), value & VALUE_MASK)
+            words.store(word, value | COPIED)
+
+    def items(self):
+        """(key hash, value) of every counter in the current table."""
+        table = self._root
+        words = table.words
+        for index in range(table.capacity):
+            k = words.load(HEADER_WORDS + 2 * index)
+            if k not in (EMPTY, SEALED_EMPTY):
+                yield k, words.load(HEADER_WORDS + 2 * index + 1) & VALUE_MASK
+
+    def snapshot(self, path: str) -> int:
+        """Write every counter to `path` atomically; returns the number written.
+
+        Holds the resize lock, so no resize runs meanwhile. Increments keep
+        going, and each counter is read once, so the snapshot is not a single
+        point in time.
+        """
+        fd = self._flock()
+        try:
+            if self._table(self._control.load(CTRL_GENERATION)).words.load(HDR_STATE) == MIGRATING:
+                self._grow_locked()  # A resize died midway; finish it first.
+            self._root = self._table(self._control.load(CTRL_GENERATION))
+            entries = list(self.items())
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, 1, len(entries)))
+                f.write(b"".join(_SNAPSHOT_ENTRY.pack(h, value) for h, value in entries))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            return len(entries)
+        finally:
+            self._unlock(fd)
+
+    @staticmethod
+    def _read_snapshot(path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, count = _SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != _SNAPSHOT_MAGIC or version != 1:
+            raise ValueError(f"{path} is not a counter table snapshot")
+        if len(data) != _SNAPSHOT_HEADER.size + count * _SNAPSHOT_ENTRY.size:
+            raise ValueError(f"Snapshot {path} is truncated")
+        return list(_SNAPSHOT_ENTRY.iter_unpack(data[_SNAPSHOT_HEADER.size:]))
+
+    def stats(self) -> dict:
+        table = self._root
+        used = table.words.load(HDR_USED)
+        return {
+            "generation": table.generation,
+            "capacity": table.capacity,
+            "keys": used,
+            "load_factor": used / table.capacity,
+            "mode": "grow" if self.growable else "fixed",
+        }
+
+    def close(self):
+        for table in self._tables.values():
+            del table.words
+            table.segment.close()
+        self._tables = {}
+        if self._control_segment is not None:
+            self._control = None
+            self._control_segment.close()
+            self._control_segment = None
@@ -0,0 +1,81 @@
+import os
+import fcntl
+import logging
+import multiprocessing
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIR = "/tmp"
+
+
+@contextmanager
+def startup_lock(name: str):
+    """Serializes a startup step across the worker processes of this host."""
+    with open(os.path.join(LOCK_DIR, f"{name}.init.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _process_start_time(pid: int) -> str:
+    # Field 22 of /proc/<pid>/stat, in clock ticks since boot. Together with the
+    # pid it tells a server apart from an earlier one that had the same pid,
+    # which is the rule in containers, where the server is always pid 1 or 7.
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return "0"
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this pid exists; one of another user counts as alive."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def server_id() -> str:
+    """Identifies the running server: the uvicorn supervisor when there are worker processes.
+
+    uvicorn starts its workers with multiprocessing, so a worker's parent
+    process is the supervisor; a single-process server is its own supervisor.
+    """
+    parent = multiprocessing.parent_process()
+    pid = parent.pid if parent is not None else os.getpid()
+    return f"{pid}:{_process_start_time(pid)}"
+
+
+def run_once(name: str, prepare) -> bool:
+    """Calls `prepare()` in the first worker of a server start; the others skip it.
+
+    The election is a lock file plus a marker holding the server id of the
+    last successful run. Whoever takes the lock first and finds no marker for
+    the running server prepares the storage; workers that follow, and workers
+    uvicorn restarts later, find the marker and return right away. If
+    `prepare()` raises, no marker is written and the next worker tries again.
+    Returns True in the process that ran `prepare()`.
+    """
+    marker = os.path.join(LOCK_DIR, f"{name}.init")
+    current = server_id()
+    with startup_lock(name):
+        try:
+            with open(marker) as f:
+                if f.read().strip() == current:
+                    return False
+        except FileNotFoundError:
+            pass
+        prepare()
+        temporary = f"{marker}.{os.getpid()}"
+        with open(temporary, 'w') as f:
+            f.write(current)
+        os.replace(temporary, marker)
+    logger.info(f"Prepared {name} for server {current}")
+    return True
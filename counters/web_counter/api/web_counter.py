@@ -1,16 +1,24 @@
 import os
+import re
+import sys
 import asyncio
 import fcntl
+import mmap
 import time
+import threading
+import functools
 import struct
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 from multiprocessing import shared_memory
-import psycopg2
-import psycopg2.errors
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
+from shared_table import WouldBlock
+
 import logging
 
 logging.basicConfig(
@@ -20,9 +28,76 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# One slot per worker, each on its own cache line: [owner pid, count, padding].
+# Workers never write each other's lines, so increments do not bounce between cores.
+SHARD_SLOT_SIZE = 64
+SHARD_OWNER_OFFSET = 0
+SHARD_VALUE_OFFSET = 8
+
+# disk_mmap file: 8 magic bytes, then the int64 counter. The magic keeps a file
+# written by another disk engine from being read as a binary counter.
+MMAP_MAGIC = b"WCMMAP01"
+MMAP_FILE_SIZE = 16
+
+
+def parse_durability(policy: str):
+    # always | os | every_ms=N | every_ops=N
+    name, _, argument = policy.partition("=")
+    if name in ("always", "os") and not argument:
+        return name, 0
+    if name in ("every_ms", "every_ops") and argument.isdigit() and int(argument) > 0:
+        return name, int(argument)
+    raise ValueError(f"Invalid DISK_MMAP_DURABILITY: {policy}")
+
+
+# Dedicated executors for the storage methods that still block, each sized on
+# its own instead of sharing the default to_thread pool.
+EXECUTOR_SIZES = {
+    "disk": ("DISK_EXECUTOR_THREADS", 8),
+    "disk_mmap": ("DISK_EXECUTOR_THREADS", 8),
+    "shared_memory": ("SHARED_MEMORY_EXECUTOR_THREADS", 8),
+    "shared_memory_table": ("SHARED_MEMORY_EXECUTOR_THREADS", 8),  # resizes and snapshots
+    "postgresql": ("PG_EXECUTOR_THREADS", None),  # psycopg2 driver only; defaults to PG_POOL_SIZE
+}
+
+
+def hazelcast_future_to_asyncio(hz_future) -> asyncio.Future:
+    # Hazelcast completes its futures on the client's reactor thread; hand the
+    # outcome back to the event loop instead of blocking a thread on result().
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(result, exception):
+        if future.cancelled():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def on_done(completed):
+        try:
+            loop.call_soon_threadsafe(deliver, completed.result(), None)
+        except Exception as e:
+            loop.call_soon_threadsafe(deliver, None, e)
+
+    hz_future.add_done_callback(on_done)
+    return future
+
+
+# Storage methods that hold named counters besides the default one.
+KEYED_STORAGE_METHODS = ("shared_memory_table", "postgresql", "hazelcast")
+
+_PG_PLACEHOLDER = re.compile(r"\$\d+")
+
+
 class WebCounterResponse(BaseModel):
     count: int
 
+
+class ResetRequest(BaseModel):
+    keys: Optional[List[str]] = None
+
 _counter_instance = None
 
 def get_counter_instance():
@@ -46,10 +121,36 @@ class WebCounter:
         self.workers = workers
         
         if self.storage_method == "disk":
-            logger.info(f"Using disk storage: {storage_path}")
+            self.disk_engine = os.getenv('DISK_ENGINE', 'file')
+            if self.disk_engine not in ("file", "log"):
+                raise ValueError(f"Invalid DISK_ENGINE: {self.disk_engine}")
+            logger.info(f"Using disk storage: {storage_path} ({self.disk_engine} engine)")
         elif self.storage_method == "shared_memory":
             logger.info(f"Using in-memory storage with shared memory")
+            self.shared_memory_sync = os.getenv('SHARED_MEMORY_SYNC', 'atomic')
+            if self.shared_memory_sync not in ("atomic", "flock"):
+                raise ValueError(f"Invalid SHARED_MEMORY_SYNC: {self.shared_memory_sync}")
+        elif self.storage_method == "shared_memory_sharded":
+            logger.info("Using sharded shared memory storage (one padded slot per worker)")
+        elif self.storage_method == "shared_memory_table":
+            self.table_mode = os.getenv('SHARED_TABLE_MODE', 'grow')
+            if self.table_mode not in ("grow", "fixed"):
+                raise ValueError(f"Invalid SHARED_TABLE_MODE: {self.table_mode}")
+            self.table_capacity = int(os.getenv('SHARED_TABLE_CAPACITY', str(1 << 20)))
+            if self.table_capacity < 1:
+                raise ValueError(f"Invalid SHARED_TABLE_CAPACITY: {self.table_capacity}")
+            self.table_max_load = float(os.getenv('SHARED_TABLE_MAX_LOAD', '0.7'))
+            if not 0.0 < self.table_max_load <= 1.0:
+                raise ValueError(f"Invalid SHARED_TABLE_MAX_LOAD: {self.table_max_load}")
+            self.table_snapshot_interval = float(os.getenv('SHARED_TABLE_SNAPSHOT_INTERVAL_S', '0'))
+            logger.info(f"Using shared memory hash table storage ({self.table_mode} mode, {self.table_capacity} initial slots)")
+        elif self.storage_method == "disk_mmap":
+            self.mmap_durability = parse_durability(os.getenv('DISK_MMAP_DURABILITY', 'every_ms=100'))
+            logger.info(f"Using memory-mapped disk storage: {storage_path} (durability {self.mmap_durability})")
         elif self.storage_method == "postgresql":
+            self.pg_driver = os.getenv('PG_DRIVER', 'asyncpg')
+            if self.pg_driver not in ("asyncpg", "psycopg2"):
+                raise ValueError(f"Invalid PG_DRIVER: {self.pg_driver}")
             logger.info(f"Using PostgreSQL storage")
         elif self.storage_method == "hazelcast":
             logger.info("Using Hazelcast IAtomicLong storage (CP Subsystem / Raft)")
@@ -57,70 +158,394 @@ class WebCounter:
         if self.storage_method == "disk":
             self.storage_path = Path(storage_path)
             self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+            self._disk_log = None
+            self._group_committer = None
             self._initialize_from_disk()
             self.shared_mem = None
             self.shared_mem_name = None
         elif self.storage_method == "shared_memory":
             self.shared_mem_name = "web_counter_shared"
+            self._atomic = None
             self._initialize_shared_memory()
+            if self.shared_memory_sync == "atomic":
+                self._initialize_atomic()
+            self.storage_path = None
+        elif self.storage_method == "shared_memory_sharded":
+            self.shared_mem_name = "web_counter_sharded"
+            self.shard_count = int(os.getenv('SHARDED_SLOTS', '64'))
+            self._initialize_shared_memory(size=self.shard_count * SHARD_SLOT_SIZE)
+            self._initialize_shards()
             self.storage_path = None
+        elif self.storage_method == "shared_memory_table":
+            self.shared_mem = None
+            self.shared_mem_name = "web_counter_table"
+            # Optional snapshot file: restored when the table is created, written on shutdown.
+            self.storage_path = Path(storage_path) if storage_path else None
+            self._initialize_table()
+        elif self.storage_method == "disk_mmap":
+            self.storage_path = Path(storage_path)
+            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+            self._initialize_disk_mmap()
+            self.shared_mem = None
+            self.shared_mem_name = None
         elif self.storage_method == "postgresql":
             self.user_id = "1"
+            self._initialize_pg_pool()
             self._initialize_postgresql(self.user_id)
             self.storage_path = None
         elif self.storage_method == "hazelcast":
-            self._atomic_long = None
+            self._atomic_long_async = None
             self.hz_client = None
             self._initialize_hazelcast()
             self.storage_path = None
             self.shared_mem = None
             self.shared_mem_name = None
 
+        self._executor = None
+        if self.storage_method in EXECUTOR_SIZES and not (self.storage_method == "postgresql" and self.pg_driver == "asyncpg"):
+            env_var, default = EXECUTOR_SIZES[self.storage_method]
+            threads = int(os.getenv(env_var, str(default or self._pg_pool.size)))
+            self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"{self.storage_method}-io")
+            logger.info(f"Blocking {self.storage_method} calls run on a dedicated executor with {threads} threads")
+
+        self._coalescer = None
+        if self.storage_method in ("postgresql", "hazelcast") and os.getenv('COALESCE_INCREMENTS', '0') == '1':
+            self._initialize_coalescer()
+
         self.app = FastAPI(
             title="Web Counter FastAPI Server",
             description="A Web Counter FastAPI server for counting web requests",
             version="1.0.0"
         )
+        self.profiler = None
+        if os.getenv('WEB_COUNTER_PROFILE', '0') == '1':
+            self._start_profiler()
+
+        # Per-request logging is off: requests are counted in /metrics instead.
+        # WEB_COUNTER_LOG_SAMPLE=N logs every Nth increment of a worker at DEBUG.
+        self._log_sample = int(os.getenv('WEB_COUNTER_LOG_SAMPLE', '0'))
+        if self._log_sample < 0:
+            raise ValueError(f"Invalid WEB_COUNTER_LOG_SAMPLE: {self._log_sample}")
+        self._log_countdown = self._log_sample
+        if self._log_sample:
+            logger.setLevel(logging.DEBUG)
+        self._dedup = None
+        if int(os.getenv('DEDUP_SLOTS', str(1 << 20))):
+            self._initialize_dedup()
+        self._metrics = None
+        if os.getenv('WEB_COUNTER_METRICS', '1') == '1':
+            self._initialize_metrics()
+        self.binary_port = int(os.getenv('BINARY_PORT', '0'))
         self.setup_routes()
 
+        # The ASGI application uvicorn serves: the FastAPI app, or the fast path in front of it.
+        self.asgi_app = self.app
+        if os.getenv('FAST_PATH', '0') == '1':
+            from fast_path import FastPathApp
+            self.asgi_app = FastPathApp(self.app, self, self._metrics)
+            logger.info("Fast path: /inc, /count and /reset are served without FastAPI routing")
+
+    def _run_blocking(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    def _start_profiler(self):
+        try:
+            from stack_sampler import StackSampler, write_collapsed
+        except ImportError:
+            # Running from web_counter/api outside Docker: the sampler lives in counters/.
+            sys.path.append(str(Path(__file__).resolve().parents[2]))
+            from stack_sampler import StackSampler, write_collapsed
+
+        interval = float(os.getenv('WEB_COUNTER_PROFILE_INTERVAL_MS', '5')) / 1000.0
+        profile_dir = Path(os.getenv('WEB_COUNTER_PROFILE_DIR', '/tmp'))
+        self.profiler = StackSampler(interval=interval).start()
+        logger.info(f"Sampling profiler started (interval {interval * 1000:.1f}ms), writing to {profile_dir} on shutdown")
+
+        @self.app.on_event("shutdown")
+        def write_profile():
+            stacks = self.profiler.stop()
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            path = profile_dir / f"web_counter_{self.storage_method}_{os.getpid()}_{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+            write_collapsed(str(path), stacks)
+            logger.info(f"Collapsed stacks ({sum(stacks.values())} samples) written to {path}")
+
+    async def _add(self, delta: int = 1) -> int:
+        if self.storage_method == "disk":
+            if self._group_committer is not None:
+                new_count = await self._group_committer.add(delta)
+            else:
+                new_count = await self._run_blocking(self._increment_disk, delta)
+        elif self.storage_method == "shared_memory":
+            if self._atomic is not None:
+                # A single lock-free instruction: cheaper than a hop to the thread pool.
+                new_count = self._increment_shared_memory_atomic(delta)
+            else:
+                new_count = await self._run_blocking(self._increment_shared_memory, delta)
+        elif self.storage_method == "disk_mmap":
+            new_count = await self._increment_disk_mmap(delta)
+        elif self.storage_method == "shared_memory_sharded":
+            new_count = self._increment_shard(delta)
+        elif self.storage_method == "shared_memory_table":
+            new_count = await self._add_table(self._table_default_key, delta)
+        elif self._coalescer is not None:
+            new_count = await self._coalescer.add(delta)
+        elif self.storage_method == "postgresql":
+            new_count = await self._add_postgresql_async(self.user_id, delta)
+        elif self.storage_method == "hazelcast":
+            if delta == 1:
+                new_count = await hazelcast_future_to_asyncio(self._atomic_long_async.increment_and_get())
+            else:
+                new_count = await hazelcast_future_to_asyncio(self._atomic_long_async.add_and_get(delta))
+        else:
+            new_count = 0
+        self._record_increment(delta, new_count)
+        return new_count
+
+    async def _add_once(self, request_id: Optional[str], apply) -> bool:
+        """Awaits `apply()`, once per idempotency key; True if the key was applied before."""
+        if request_id is None:
+            await apply()
+            return False
+        if self._dedup is None:
+            raise HTTPException(status_code=501, detail="Idempotency keys are disabled on this server")
+        return await self._dedup.run_once(request_id, apply)
+
+    def _record_increment(self, delta: int, new_count: int = None, key: str = None):
+        if self._metrics is not None:
+            self._metrics.add_increments(delta)
+        if self._log_sample:
+            # Sampled: formatting and writing a line per request costs more than the increment.
+            self._log_countdown -= 1
+            if not self._log_countdown:
+                self._log_countdown = self._log_sample
+                logger.debug("Incremented %s (%s) by %d: %s", self.storage_method, key or "default", delta, new_count)
+
+    def _require_keyed(self):
+        if self.storage_method not in KEYED_STORAGE_METHODS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Storage method {self.storage_method} has a single counter; keyed counters need one of {', '.join(KEYED_STORAGE_METHODS)}",
+            )
+
+    async def _add_keyed(self, key: str, delta: int = 1) -> int:
+        if self.storage_method == "shared_memory_table":
+            new_count = await self._add_table(self._table.hash_key(key), delta)
+        elif self.storage_method == "postgresql":
+            # Upsert, so the first increment of a key creates its row.
+            new_count = await self._pg_fetchval(
+                "INSERT INTO user_counter (user_id, counter, version) VALUES ($1, $2, 0) "
+                "ON CONFLICT (user_id) DO UPDATE SET counter = user_counter.counter + EXCLUDED.counter "
+                "RETURNING counter",
+                self._pg_key_row(key), delta,
+            )
+        else:
+            new_count = await hazelcast_future_to_asyncio(self._hz_atomic_long(key).add_and_get(delta))
+        self._record_increment(delta, new_count, key)
+        return new_count
+
+    async def _read_keyed(self, key: str) -> int:
+        if self.storage_method == "shared_memory_table":
+            return await self._table_call(self._table.get, self._table.hash_key(key))
+        if self.storage_method == "postgresql":
+            result = await self._pg_fetchval("SELECT counter FROM user_counter WHERE user_id = $1", self._pg_key_row(key))
+            return 0 if result is None else result
+        return await hazelcast_future_to_asyncio(self._hz_atomic_long(key).get())
+
+    async def _reset_keys(self, keys):
+        if self.storage_method == "shared_memory_table":
+            for key in keys:
+                await self._table_call(self._table.set, self._table.hash_key(key), 0)
+            self._maybe_grow_table()
+        elif self.storage_method == "postgresql":
+            await self._pg_fetchval(
+                "INSERT INTO user_counter (user_id, counter, version) SELECT k, 0, 0 FROM unnest($1::varchar[]) AS t(k) "
+                "ON CONFLICT (user_id) DO UPDATE SET counter = 0",
+                [self._pg_key_row(key) for key in keys],
+            )
+        else:
+            await asyncio.gather(*(hazelcast_future_to_asyncio(self._hz_atomic_long(key).set(0)) for key in keys))
+
+    async def _add_batch(self, deltas: dict):
+        keyed = {key: delta for key, delta in deltas.items() if key is not None}
+        if not keyed:
+            if deltas:
+                await self._add(deltas[None])
+            return
+        self._require_keyed()
+        if self.storage_method == "shared_memory_table":
+            for key, delta in deltas.items():
+                await self._add_table(self._table_default_key if key is None else self._table.hash_key(key), delta)
+            self._record_increment(sum(deltas.values()), key=f"batch of {len(deltas)}")
+        elif self.storage_method == "postgresql":
+            # One statement for the whole batch; the default counter is just its row.
+            keyed = {self._pg_key_row(key): delta for key, delta in keyed.items()}
+            if None in deltas:
+                keyed[self.user_id] = deltas[None]
+            await self._pg_fetchval(
+                "INSERT INTO user_counter (user_id, counter, version) "
+                "SELECT k, d, 0 FROM unnest($1::varchar[], $2::int[]) AS t(k, d) "
+                "ON CONFLICT (user_id) DO UPDATE SET counter = user_counter.counter + EXCLUDED.counter",
+                list(keyed), list(keyed.values()),
+            )
+            self._record_increment(sum(keyed.values()), key=f"batch of {len(keyed)}")
+        else:
+            # Hazelcast has no multi-counter operation: the calls are pipelined on
+            # the client connection and the batch costs one round trip, not N.
+            calls = [hazelcast_future_to_asyncio(self._hz_atomic_long(key).add_and_get(delta)) for key, delta in keyed.items()]
+            if None in deltas:
+                calls.append(self._add(deltas[None]))  # Recorded by _add itself.
+            await asyncio.gather(*calls)
+            self._record_increment(sum(keyed.values()), key=f"batch of {len(keyed)}")
+
+    async def _pg_fetchval(self, sql: str, *args):
+        # Queries are written for asyncpg ($n placeholders, each used once and in
+        # order) and rewritten to %s for psycopg2.
+        if self._pg_async_pool is not None:
+            async with self._pg_async_pool.connection() as conn:
+                return await conn.fetchval(sql, *args)
+        return await self._run_blocking(self._pg_fetchval_blocking, _PG_PLACEHOLDER.sub("%s", sql), args)
+
+    def _pg_fetchval_blocking(self, sql: str, args):
+        with self._pg_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, args)
+                row = cursor.fetchone() if cursor.description else None
+            conn.commit()
+        return row[0] if row else None
+
+    async def _add_table(self, h: int, delta: int = 1) -> int:
+        new_count = await self._table_call(self._table.add, h, delta)
+        self._maybe_grow_table()
+        return new_count
+
+    async def _table_call(self, operation, *args):
+        # Inline on the event loop in the common case. When the operation would
+        # wait for a resize (inserts outran it, or the slot is being copied), it
+        # is retried on the executor so the worker keeps serving other requests.
+        try:
+            return operation(*args, wait=False)
+        except WouldBlock:
+            return await self._run_blocking(operation, *args)
+
+    def _maybe_grow_table(self):
+        # Resizing copies the whole table, so it runs on the executor while this
+        # and the other workers keep counting.
+        if self._table.needs_growth() and self._table_growth is None:
+            self._table_growth = self._run_blocking(self._table.grow)
+            self._table_growth.add_done_callback(self._table_growth_done)
+
+    def _table_growth_done(self, growth):
+        self._table_growth = None
+        if not growth.cancelled() and growth.exception() is not None:
+            # The next increment over the load limit tries again.
+            logger.error(f"Resizing counter table {self._table.name} failed: {growth.exception()!r}")
+
+    @staticmethod
+    def _pg_key_row(key: str) -> str:
+        # Keyed rows are namespaced, like the Hazelcast counters, so that no key
+        # shares the default counter's row (user_id "1").
+        return f"key:{key}"
+
+    def _hz_atomic_long(self, key: str):
+        proxy = self._hz_keyed.get(key)
+        if proxy is None:
+            proxy = self.hz_client.cp_subsystem.get_atomic_long(f"{self._hz_atomic_long_name}-{key}")
+            self._hz_keyed[key] = proxy
+        return proxy
+
     async def _read_value(self) -> int:
         if self.storage_method == "disk":
-            return await asyncio.to_thread(self._read_from_disk)
+            return await self._run_blocking(self._read_from_disk)
         elif self.storage_method == "shared_memory":
-            return await asyncio.to_thread(self._read_from_shared_memory)
+            return self._read_from_shared_memory()
+        elif self.storage_method == "shared_memory_sharded":
+            return self._read_from_shards()
+        elif self.storage_method == "disk_mmap":
+            return self._mmap_counter.load()
+        elif self.storage_method == "shared_memory_table":
+            return await self._table_call(self._table.get, self._table_default_key)
         elif self.storage_method == "postgresql":
-            return await asyncio.to_thread(self._read_from_postgresql, self.user_id)
+            return await self._read_from_postgresql_async(self.user_id)
         elif self.storage_method == "hazelcast":
-            return await asyncio.to_thread(self._read_from_hazelcast)
+            return await hazelcast_future_to_asyncio(self._atomic_long_async.get())
         return 0
 
     async def _write_value(self, value: int):
         if self.storage_method == "disk":
-            logger.info(f"Writing value to disk: {value}")
-            await asyncio.to_thread(self._write_to_disk, value)
+            logger.debug("Writing value to disk: %d", value)
+            await self._run_blocking(self._write_to_disk, value)
         elif self.storage_method == "shared_memory":
-            logger.info(f"Writing value to shared memory: {value}")
-            await asyncio.to_thread(self._write_to_shared_memory, value)
+            logger.debug("Writing value to shared memory: %d", value)
+            self._write_to_shared_memory(value)
+        elif self.storage_method == "shared_memory_sharded":
+            logger.debug("Writing value to sharded shared memory: %d", value)
+            self._write_to_shards(value)
+        elif self.storage_method == "disk_mmap":
+            logger.debug("Writing value to memory-mapped file: %d", value)
+            self._mmap_counter.store(value)
+            await self._run_blocking(self._mmap.flush)
+        elif self.storage_method == "shared_memory_table":
+            logger.debug("Writing value to shared memory table: %d", value)
+            await self._table_call(self._table.set, self._table_default_key, value)
         elif self.storage_method == "postgresql":
-            logger.info(f"Writing value to PostgreSQL: {value}")
-            await asyncio.to_thread(self._write_to_postgresql, self.user_id, value)
+            logger.debug("Writing value to PostgreSQL: %d", value)
+            await self._write_to_postgresql_async(self.user_id, value)
         elif self.storage_method == "hazelcast":
-            logger.info(f"Writing value to Hazelcast IAtomicLong: {value}")
-            await asyncio.to_thread(self._write_to_hazelcast, value)
+            logger.debug("Writing value to Hazelcast IAtomicLong: %d", value)
+            await hazelcast_future_to_asyncio(self._atomic_long_async.set(value))
 
     def _read_from_shared_memory(self):
+        if self._atomic is not None:
+            return self._atomic.load()
         return struct.unpack_from('q', self.shared_mem.buf, 0)[0]
     
     def _write_to_shared_memory(self, value: int):
+        if self._atomic is not None:
+            self._atomic.store(value)
+            return
         struct.pack_into('q', self.shared_mem.buf, 0, value)
     
-    def _read_from_hazelcast(self) -> int:
-        return self._atomic_long.get()
+    def _read_from_shards(self) -> int:
+        return sum(slot.load() for slot in self._shard_values)
 
-    def _write_to_hazelcast(self, value: int):
-        self._atomic_long.set(value)
-    
-    def _increment_shared_memory(self) -> int:
+    def _write_to_shards(self, value: int):
+        # Not atomic with respect to concurrent increments, like /reset on the
+        # other storage methods: it is meant to run before the load starts.
+        for slot in self._shard_values:
+            slot.store(0)
+        self._own_shard.store(value)
+
+    async def _increment_disk_mmap(self, delta: int = 1) -> int:
+        new_count = self._mmap_counter.add_fetch(delta)
+        policy, argument = self.mmap_durability
+        if policy == "always":
+            await self._run_blocking(self._mmap.flush)
+        elif policy == "every_ops" and new_count // argument != (new_count - delta) // argument:
+            # The counter is global, so exactly one worker crosses each multiple of N
+            # and the loss window stays N increments regardless of WORKERS.
+            self._mmap_flush_requested.set()
+        return new_count
+
+    def _run_mmap_flusher(self):
+        policy, argument = self.mmap_durability
+        while True:
+            if policy == "every_ms":
+                time.sleep(argument / 1000.0)
+            else:
+                self._mmap_flush_requested.wait()
+                self._mmap_flush_requested.clear()
+            try:
+                self._mmap.flush()
+            except (OSError, ValueError) as e:
+                logger.error(f"Error flushing memory-mapped counter: {e}")
+
+    def _increment_shared_memory_atomic(self, delta: int = 1) -> int:
+        return self._atomic.add_fetch(delta)
+
+    def _increment_shard(self, delta: int = 1) -> int:
+        return self._own_shard.add_fetch(delta)
+
+    def _increment_shared_memory(self, delta: int = 1) -> int:
         lock_file_path = Path('/tmp/web_counter_shared_memory.lock')
         max_retries = 10
         retry_delay = 0.001
@@ -133,7 +558,7 @@ class WebCounter:
                     fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
                     try:
                         current = struct.unpack_from('q', self.shared_mem.buf, 0)[0]
-                        new_value = current + 1
+                        new_value = current + delta
                         struct.pack_into('q', self.shared_mem.buf, 0, new_value)
                         return new_value
                     finally:
@@ -146,24 +571,26 @@ class WebCounter:
                 else:
                     logger.error("Failed to acquire lock after all retries, proceeding without lock")
                     current = struct.unpack_from('q', self.shared_mem.buf, 0)[0]
-                    new_value = current + 1
+                    new_value = current + delta
                     struct.pack_into('q', self.shared_mem.buf, 0, new_value)
                     return new_value
             except Exception as e:
                 logger.error(f"Unexpected error in shared memory increment: {e}")
                 current = struct.unpack_from('q', self.shared_mem.buf, 0)[0]
-                new_value = current + 1
+                new_value = current + delta
                 struct.pack_into('q', self.shared_mem.buf, 0, new_value)
                 return new_value
         
         current = struct.unpack_from('q', self.shared_mem.buf, 0)[0]
-        new_value = current + 1
+        new_value = current + delta
         struct.pack_into('q', self.shared_mem.buf, 0, new_value)
         return new_value
 
     def _read_from_disk(self) -> int:
         if self.storage_path is None:
             return 0
+        if self._disk_log is not None:
+            return self._disk_log.read()
         try:
             if self.storage_path.exists():
                 with open(self.storage_path, 'r') as f:
@@ -182,6 +609,10 @@ class WebCounter:
     def _write_to_disk(self, value: int):
         if self.storage_path is None:
             return
+        if self._disk_log is not None:
+            from disk_log import OP_SET
+            self._disk_log.append(OP_SET, value)
+            return
         try:
             self.storage_path.parent.mkdir(parents=True, exist_ok=True)
             with open(self.storage_path, 'w') as f:
@@ -195,7 +626,7 @@ class WebCounter:
         except IOError as e:
             logger.error(f"Error writing to disk: {e}")
 
-    def _increment_disk(self) -> int:
+    def _increment_disk(self, delta: int = 1) -> int:
         if self.storage_path is None:
             return 0
         self.storage_path.parent.mkdir(parents=True, exist_ok=True)
@@ -215,7 +646,7 @@ class WebCounter:
                         content = f.read().strip()
                         current_count = int(content) if content else 0
                         
-                        new_count = current_count + 1
+                        new_count = current_count + delta
                         
                         f.seek(0)
                         f.truncate(0)
@@ -242,10 +673,10 @@ class WebCounter:
                         with open(self.storage_path, 'w') as f:
                             fcntl.flock(f.fileno(), fcntl.LOCK_EX)
                             try:
-                                f.write('1')
+                                f.write(str(delta))
                                 f.flush()
                                 os.fsync(f.fileno())
-                                return 1
+                                return delta
                             finally:
                                 fcntl.flock(f.fileno(), fcntl.LOCK_UN)
                     except IOError as e2:
@@ -255,12 +686,14 @@ class WebCounter:
         return 0
     
     def _get_db_connection(self):
+        # Imported on first use: a worker on the asyncpg driver never loads psycopg2.
         db_host = os.getenv('DB_HOST', 'localhost')
         db_port = os.getenv('DB_PORT', '5432')
         db_name = os.getenv('POSTGRES_DB', 'counter_db')
         db_user = os.getenv('POSTGRES_USER', 'postgres')
         db_password = os.getenv('POSTGRES_PASSWORD', 'postgres')
         
+        import psycopg2
         return psycopg2.connect(
             host=db_host,
             port=db_port,
@@ -270,82 +703,166 @@ class WebCounter:
         )
 
     def _read_from_postgresql(self, user_id: str) -> int:
-        conn = None
-        cursor = None
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT counter FROM user_counter WHERE user_id = %s", (user_id,))
-            result = cursor.fetchone()
-            conn.commit()
+            with self._pg_pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT counter FROM user_counter WHERE user_id = %s", (user_id,))
+                    result = cursor.fetchone()
+                conn.commit()
             
             if result is None:
                 return 0
             return result[0]
-        except psycopg2.Error as e:
-            if conn:
-                conn.rollback()
+        except self._psycopg2.Error as e:
             logger.error(f"Error reading from PostgreSQL: {e}")
             return 0
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
     
     def _write_to_postgresql(self, user_id: str, value: int):
-        conn = None
-        cursor = None
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE user_counter SET counter = %s WHERE user_id = %s", (value, user_id))
-            conn.commit()
-            logger.info(f"Updated counter value to: {value}")
-        except psycopg2.Error as e:
-            if conn:
-                conn.rollback()
+            with self._pg_pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("UPDATE user_counter SET counter = %s WHERE user_id = %s", (value, user_id))
+                conn.commit()
+            logger.debug("Updated counter value to: %d", value)
+        except self._psycopg2.Error as e:
             logger.error(f"Error writing to PostgreSQL: {e}")
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
     
     def _increment_postgresql(self, user_id: str) -> int:
-        conn = None
-        cursor = None
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("UPDATE user_counter SET counter = counter + 1 WHERE user_id = %s RETURNING counter", (user_id,))
-            result = cursor.fetchone()
-            conn.commit()
+            with self._pg_pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("UPDATE user_counter SET counter = counter + 1 WHERE user_id = %s RETURNING counter", (user_id,))
+                    result = cursor.fetchone()
+                conn.commit()
             
             if result:
                 new_value = result[0]
-                logger.info(f"Incremented counter to: {new_value}")
+                logger.debug("Incremented counter to: %d", new_value)
                 return new_value
             else:
                 logger.error(f"UPDATE did not affect any rows for user_id={user_id}. Row may not exist.")
                 raise ValueError(f"Counter row not found for user_id={user_id}")
-        except psycopg2.Error as e:
-            if conn:
-                conn.rollback()
+        except self._psycopg2.Error as e:
             logger.error(f"Error incrementing in PostgreSQL: {e}")
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
     
-    def _increment_hazelcast(self) -> int:
-        return self._atomic_long.increment_and_get()
+    async def _read_from_postgresql_async(self, user_id: str) -> int:
+        if self._pg_async_pool is None:
+            return await self._run_blocking(self._read_from_postgresql, user_id)
+        try:
+            async with self._pg_async_pool.connection() as conn:
+                result = await conn.fetchval("SELECT counter FROM user_counter WHERE user_id = $1", user_id)
+            return 0 if result is None else result
+        except Exception as e:
+            logger.error(f"Error reading from PostgreSQL: {e}")
+            return 0
+
+    async def _write_to_postgresql_async(self, user_id: str, value: int):
+        if self._pg_async_pool is None:
+            return await self._run_blocking(self._write_to_postgresql, user_id, value)
+        async with self._pg_async_pool.connection() as conn:
+            await conn.execute("UPDATE user_counter SET counter = $1 WHERE user_id = $2", value, user_id)
+        logger.debug("Updated counter value to: %d", value)
+
+    async def _add_postgresql_async(self, user_id: str, delta: int = 1) -> int:
+        if self._pg_async_pool is None:
+            if delta == 1:
+                return await self._run_blocking(self._increment_postgresql, user_id)
+            return await self._run_blocking(self._add_postgresql, user_id, delta)
+        async with self._pg_async_pool.connection() as conn:
+            result = await conn.fetchval("UPDATE user_counter SET counter = counter + $1 WHERE user_id = $2 RETURNING counter", delta, user_id)
+        if result is None:
+            logger.error(f"UPDATE did not affect any rows for user_id={user_id}. Row may not exist.")
+            raise ValueError(f"Counter row not found for user_id={user_id}")
+        return result
+
+    def _add_postgresql(self, user_id: str, delta: int) -> int:
+        with self._pg_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE user_counter SET counter = counter + %s WHERE user_id = %s RETURNING counter", (delta, user_id))
+                result = cursor.fetchone()
+            conn.commit()
+        if not result:
+            raise ValueError(f"Counter row not found for user_id={user_id}")
+        return result[0]
+
+    def _initialize_metrics(self):
+        from metrics import WorkerMetrics, MetricsMiddleware
+        name = f"web_counter_metrics_{self.storage_method}"
+        self._metrics = WorkerMetrics(name, slots=int(os.getenv('METRICS_SLOTS', '64')))
+        self.app.add_middleware(MetricsMiddleware, metrics=self._metrics)
+        for coalescer in (self._coalescer, getattr(self, "_group_committer", None)):
+            if coalescer is not None:
+                self._metrics.add_source(lambda c=coalescer: {
+                    "coalescer_calls_total": c.calls,
+                    "coalescer_increments_total": c.coalesced,
+                })
+        if self._dedup is not None:
+            dedup = self._dedup
+            self._metrics.add_source(lambda: {
+                "dedup_duplicates_total": dedup.duplicates,
+                "dedup_conflicts_total": dedup.conflicts,
+                "dedup_evictions_total": dedup.evictions,
+            })
+        if self.storage_method == "postgresql":
+            pool = self._pg_pool
+            self._metrics.add_source(lambda: {
+                "pg_pool_checkouts_total": pool.checkouts,
+                "pg_pool_waits_total": pool.waits,
+                "pg_pool_wait_seconds_total": pool.wait_ns_total,
+                "pg_pool_timeouts_total": pool.timeouts,
+            })
+        logger.info(f"Metrics in shared memory {name}, slot {self._metrics.slot}/{self._metrics.slots}")
+
+    def _initialize_dedup(self):
+        from dedup import RequestDedup
+        name = f"web_counter_dedup_{self.storage_method}"
+        try:
+            self._dedup = RequestDedup(
+                name,
+                slots=int(os.getenv('DEDUP_SLOTS', str(1 << 20))),
+                window_s=float(os.getenv('DEDUP_WINDOW_S', '60')),
+            )
+        except OSError as e:
+            logger.warning(f"Atomic operations unavailable ({e}), idempotency keys are disabled")
+            return
+        logger.info(f"Idempotency keys deduplicated in shared memory {name}: {self._dedup.slots} slots, {self._dedup.window_s:g}s window")
+
+    async def _refresh_metric_sources(self):
+        while True:
+            self._metrics.refresh_sources()
+            await asyncio.sleep(1.0)
+
+    def _initialize_coalescer(self):
+        from coalescer import IncrementCoalescer
+        if self.storage_method == "postgresql":
+            apply = lambda n: self._add_postgresql_async(self.user_id, n)
+        else:
+            apply = lambda n: hazelcast_future_to_asyncio(self._atomic_long_async.add_and_get(n))
+        self._coalescer = IncrementCoalescer(
+            apply,
+            window_ms=float(os.getenv('COALESCE_WINDOW_MS', '1')),
+            max_batch=int(os.getenv('COALESCE_MAX_BATCH', '256')),
+        )
+        logger.info(f"Coalescing increments: window {self._coalescer.window * 1000:.2f}ms, up to {self._coalescer.max_batch} per call")
 
     def _initialize_from_disk(self):
+        if self.disk_engine == "log":
+            from disk_log import AppendOnlyLog, OP_ADD
+            from coalescer import IncrementCoalescer
+            self._disk_log = AppendOnlyLog(
+                str(self.storage_path),
+                compact_bytes=int(os.getenv('DISK_LOG_COMPACT_BYTES', str(4 * 1024 * 1024))),
+                compact_interval_s=float(os.getenv('DISK_LOG_COMPACT_INTERVAL_S', '60')),
+            )
+            self._disk_log.recover()
+            # Group commit: the increments queued behind one fsync share the next one.
+            self._group_committer = IncrementCoalescer(
+                lambda n: self._run_blocking(self._disk_log.append, OP_ADD, n),
+                window_ms=int(os.getenv('DISK_LOG_GROUP_COMMIT_US', '0')) / 1000.0,
+            )
+            return
         try:
             if self.storage_path.exists():
                 with open(self.storage_path, 'r') as f:
@@ -355,33 +872,172 @@ class WebCounter:
         except (ValueError, IOError, OSError) as e:
             logger.warning(f"Could not read initial value from disk: {e}")
     
-    def _initialize_shared_memory(self):
-        max_retries = 3
-        for attempt in range(max_retries):
+    def _initialize_disk_mmap(self):
+        from atomic_ops import AtomicInt64
+        from startup import startup_lock
+
+        # Only an empty file becomes a new counter, under the lock so that a
+        # racing worker never sees the file before its magic is written. Any
+        # other file that is not a counter of this layout is refused unchanged.
+        with startup_lock("web_counter_disk_mmap"):
+            fd = os.open(self.storage_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                if size == 0:
+                    os.write(fd, MMAP_MAGIC + struct.pack('<q', 0))
+                    os.fsync(fd)
+                elif size != MMAP_FILE_SIZE or os.pread(fd, len(MMAP_MAGIC), 0) != MMAP_MAGIC:
+                    raise RuntimeError(
+                        f"{self.storage_path} is not a disk_mmap counter ({size} bytes without its header); "
+                        f"move it away or use the storage method that wrote it"
+                    )
+                self._mmap = mmap.mmap(fd, MMAP_FILE_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                os.close(fd)
+        self._mmap_counter = AtomicInt64(self._mmap, len(MMAP_MAGIC))
+        logger.info(f"Memory-mapped counter at {self.storage_path}: {self._mmap_counter.load()}")
+
+        self._mmap_flush_requested = threading.Event()
+        if self.mmap_durability[0] in ("every_ms", "every_ops"):
+            threading.Thread(target=self._run_mmap_flusher, name="mmap-flusher", daemon=True).start()
+
+    def _initialize_shared_memory(self, size: int = 8):
+        # Create-or-attach under a lock: only the first worker creates the
+        # segment, the others attach, and nobody races on FileExistsError.
+        from startup import startup_lock
+        with startup_lock(self.shared_mem_name):
             try:
                 self.shared_mem = shared_memory.SharedMemory(name=self.shared_mem_name, create=False)
                 logger.info(f"Attached to existing shared memory: {self.shared_mem_name}")
-                break
             except FileNotFoundError:
-                try:
-                    self.shared_mem = shared_memory.SharedMemory(name=self.shared_mem_name, create=True, size=8)
-                    struct.pack_into('q', self.shared_mem.buf, 0, 0)
-                    logger.info(f"Created new shared memory: {self.shared_mem_name}")
-                    break
-                except FileExistsError:
-                    if attempt < max_retries - 1:
-                        time.sleep(0.01 * (attempt + 1))
-                        continue
-                    else:
-                        try:
-                            self.shared_mem = shared_memory.SharedMemory(name=self.shared_mem_name, create=False)
-                            logger.info(f"Attached to existing shared memory after retry: {self.shared_mem_name}")
-                            break
-                        except Exception as e:
-                            logger.error(f"Failed to attach to shared memory after {max_retries} attempts: {e}")
-                            raise
-    
+                self.shared_mem = shared_memory.SharedMemory(name=self.shared_mem_name, create=True, size=size)
+                struct.pack_into('q', self.shared_mem.buf, 0, 0)
+                logger.info(f"Created new shared memory: {self.shared_mem_name}")
+
+    def _initialize_atomic(self):
+        try:
+            from atomic_ops import AtomicInt64
+            self._atomic = AtomicInt64(self.shared_mem.buf, 0)
+            logger.info("Shared memory counter uses atomic fetch-and-add")
+        except OSError as e:
+            logger.warning(f"Atomic operations unavailable ({e}), falling back to flock")
+            self.shared_memory_sync = "flock"
+
+    def _initialize_shards(self):
+        from atomic_ops import AtomicInt64
+        from multiprocessing import resource_tracker
+        from startup import process_alive
+
+        # The resource tracker unlinks a segment when the process that created it
+        # exits, which would drop every slot when the first worker goes away.
+        try:
+            resource_tracker.unregister(self.shared_mem._name, "shared_memory")
+        except Exception as e:
+            logger.debug(f"Could not unregister {self.shared_mem_name} from the resource tracker: {e}")
+
+        if self.shared_mem.size < self.shard_count * SHARD_SLOT_SIZE:
+            raise RuntimeError(
+                f"Shared memory {self.shared_mem_name} holds {self.shared_mem.size // SHARD_SLOT_SIZE} slots, "
+                f"SHARDED_SLOTS={self.shard_count} needs more; remove /dev/shm/{self.shared_mem_name} to resize"
+            )
+        buf = self.shared_mem.buf
+        owners = [AtomicInt64(buf, i * SHARD_SLOT_SIZE + SHARD_OWNER_OFFSET) for i in range(self.shard_count)]
+        self._shard_values = [AtomicInt64(buf, i * SHARD_SLOT_SIZE + SHARD_VALUE_OFFSET) for i in range(self.shard_count)]
+
+        # A process that initializes again, like the parent of `python
+        # web_counter.py`, keeps the slot it already owns.
+        pid = os.getpid()
+        for index, owner in enumerate(owners):
+            if owner.load() == pid:
+                self.shard_index = index
+                self._own_shard = self._shard_values[index]
+                logger.info(f"Reusing shard slot {index}/{self.shard_count}")
+                return
+
+        # Claim a free slot, or take over the slot of a worker that has exited.
+        # The count in a taken-over slot is kept and keeps growing, so restarts
+        # never lose increments. The claim is a compare-and-swap on the owner pid.
+        for index, owner in enumerate(owners):
+            current = owner.load()
+            if current and process_alive(current):
+                continue
+            if owner.compare_exchange(current, pid):
+                self.shard_index = index
+                self._own_shard = self._shard_values[index]
+                inherited = f", inherited count {self._own_shard.load()} from pid {current}" if current else ""
+                logger.info(f"Claimed shard slot {index}/{self.shard_count}{inherited}")
+                return
+        raise RuntimeError(f"All {self.shard_count} shard slots are owned by live processes; raise SHARDED_SLOTS")
+
+    def _initialize_table(self):
+        from shared_table import SharedHashTable
+        self._table = SharedHashTable(
+            self.shared_mem_name,
+            capacity=self.table_capacity,
+            mode=self.table_mode,
+            max_load=self.table_max_load,
+            lock_path=f"/tmp/{self.shared_mem_name}.lock",
+        )
+        snapshot = str(self.storage_path) if self.storage_path else None
+        if self._table.open(snapshot):
+            logger.info(f"Created shared memory table {self.shared_mem_name}: {self._table.stats()}")
+        else:
+            logger.info(f"Attached to shared memory table {self.shared_mem_name}: {self._table.stats()}")
+        # The unkeyed counter is the entry of the empty key, which no /inc/{key} can name.
+        self._table_default_key = self._table.hash_key("")
+        self._table_growth = None
+        if snapshot and self.table_snapshot_interval > 0:
+            threading.Thread(target=self._run_table_snapshots, name="table-snapshots", daemon=True).start()
+
+    def _snapshot_table(self):
+        started = time.perf_counter()
+        written = self._table.snapshot(str(self.storage_path))
+        logger.info(f"Snapshot of {written} counters written to {self.storage_path} in {time.perf_counter() - started:.2f}s")
+
+    def _run_table_snapshots(self):
+        while True:
+            time.sleep(self.table_snapshot_interval)
+            try:
+                self._snapshot_table()
+            except Exception as e:
+                logger.error(f"Table snapshot failed: {e}")
+
+    def _initialize_pg_pool(self):
+        from pg_pool import ConnectionPool, AsyncConnectionPool
+        size = int(os.getenv('PG_POOL_SIZE', '10'))
+        timeout = float(os.getenv('PG_POOL_TIMEOUT', '30'))
+        health_check_after = float(os.getenv('PG_POOL_HEALTH_CHECK_AFTER', '30'))
+        self._pg_async_pool = None
+        if self.pg_driver == "asyncpg":
+            # Opened on startup, inside the worker's event loop.
+            self._pg_async_pool = AsyncConnectionPool(
+                {
+                    "host": os.getenv('DB_HOST', 'localhost'),
+                    "port": int(os.getenv('DB_PORT', '5432')),
+                    "database": os.getenv('POSTGRES_DB', 'counter_db'),
+                    "user": os.getenv('POSTGRES_USER', 'postgres'),
+                    "password": os.getenv('POSTGRES_PASSWORD', 'postgres'),
+                },
+                size=size,
+                timeout=timeout,
+                health_check_after=health_check_after,
+            )
+            self._pg_pool = self._pg_async_pool
+        else:
+            import psycopg2
+            self._psycopg2 = psycopg2
+            self._pg_pool = ConnectionPool(self._get_db_connection, size=size, timeout=timeout, health_check_after=health_check_after)
+        logger.info(f"PostgreSQL connection pool ({self.pg_driver}): up to {size} connections per worker")
+
     def _initialize_postgresql(self, user_id: str):
+        # Recreating the table wipes every count, so it happens once per server
+        # start; the other workers attach to the table it left behind.
+        from startup import run_once
+        run_once("web_counter_postgresql", lambda: self._prepare_postgresql(user_id))
+
+    def _prepare_postgresql(self, user_id: str):
+        import psycopg2
+        import psycopg2.errors
         conn = None
         cursor = None
         try:
@@ -448,42 +1104,143 @@ class WebCounter:
             redo_operation=True,
         )
         atomic_long_name = os.getenv("HZ_ATOMIC_LONG_NAME", "counter")
-        self._atomic_long = self.hz_client.cp_subsystem.get_atomic_long(atomic_long_name).blocking()
+        self._hz_atomic_long_name = atomic_long_name
+        self._hz_keyed = {}
+        # The non-blocking proxy returns Hazelcast futures that are awaited through
+        # hazelcast_future_to_asyncio.
+        self._atomic_long_async = self.hz_client.cp_subsystem.get_atomic_long(atomic_long_name)
         logger.info("Hazelcast IAtomicLong initialized: name=%s", atomic_long_name)
 
     def setup_routes(self):
 
+        if self.storage_method == "disk_mmap":
+            @self.app.on_event("shutdown")
+            def flush_mmap():
+                self._mmap.flush()
+                logger.info(f"Flushed memory-mapped counter: {self._mmap_counter.load()}")
+
+        if self.storage_method == "shared_memory_table":
+            from shared_table import TableFull
+
+            @self.app.exception_handler(TableFull)
+            async def table_full(request, exc):
+                return JSONResponse(status_code=507, content={"detail": str(exc)})
+
+            @self.app.get("/table/stats")
+            async def table_stats():
+                return self._table.stats()
+
+            if self.storage_path is not None:
+                @self.app.on_event("shutdown")
+                def snapshot_table():
+                    self._snapshot_table()
+
+        if self._metrics is not None:
+            @self.app.get("/metrics")
+            async def metrics():
+                self._metrics.refresh_sources()
+                return PlainTextResponse(
+                    self._metrics.render({"storage_method": self.storage_method}),
+                    media_type="text/plain; version=0.0.4",
+                )
+
+            @self.app.on_event("startup")
+            async def start_metric_sources():
+                # Keeps this worker's copies of the coalescer and pool counters
+                # current for whichever worker answers /metrics.
+                self._metric_sources_task = asyncio.create_task(self._refresh_metric_sources())
+
+        if self.binary_port:
+            @self.app.on_event("startup")
+            async def start_binary_server():
+                from binary_protocol import BinaryCounterServer
+                error_statuses = {}
+                if self.storage_method == "shared_memory_table":
+                    error_statuses[TableFull] = 507
+                self._binary_server = BinaryCounterServer(self, os.getenv('BINARY_HOST', self.host), self.binary_port, error_statuses)
+                await self._binary_server.start()
+                logger.info(f"Binary protocol listening on port {self.binary_port}")
+
+            @self.app.on_event("shutdown")
+            async def stop_binary_server():
+                await self._binary_server.close()
+
+        if self._dedup is not None:
+            from dedup import RequestInProgress
+
+            @self.app.exception_handler(RequestInProgress)
+            async def request_in_progress(request, exc):
+                return JSONResponse(status_code=409, content={"detail": str(exc)})
+
         @self.app.post("/reset")
-        async def reset():
-            if self.storage_method == "postgresql":
-                await asyncio.to_thread(self._write_to_postgresql, self.user_id, 0)
-            elif self.storage_method == "hazelcast":
-                await asyncio.to_thread(self._write_to_hazelcast, 0)
-            else:
-                await self._write_value(0)
+        async def reset(body: Optional[ResetRequest] = None):
+            await self._write_value(0)
+            if body is not None and body.keys:
+                self._require_keyed()
+                await self._reset_keys(body.keys)
             return {"status": "ok"}
 
+        # Increments accept an Idempotency-Key header: a repeat of a key that was
+        # applied within DEDUP_WINDOW_S is answered without counting again.
         @self.app.post("/inc")
-        async def increment():
-            if self.storage_method == "disk":
-                new_count = await asyncio.to_thread(self._increment_disk)
-                logger.info(f"Writing value to disk: {new_count}")
-            elif self.storage_method == "shared_memory":
-                new_count = await asyncio.to_thread(self._increment_shared_memory)
-                logger.info(f"Incremented shared memory: {new_count}")
-            elif self.storage_method == "postgresql":
-                new_count = await asyncio.to_thread(self._increment_postgresql, self.user_id)
-                logger.info(f"Incremented PostgreSQL: {new_count}")
-            elif self.storage_method == "hazelcast":
-                new_count = await asyncio.to_thread(self._increment_hazelcast)
-                logger.info(f"Incremented Hazelcast IAtomicLong: {new_count}")
+        async def increment(by: int = Query(1, ge=1), idempotency_key: Optional[str] = Header(None)):
+            if await self._add_once(idempotency_key, lambda: self._add(by)):
+                return {"status": "ok", "duplicate": True}
+            return {"status": "ok"}
+
+        # Declared before /inc/{key} so that "batch" is not taken for a key.
+        @self.app.post("/inc/batch")
+        async def increment_batch(pairs: List[Tuple[Optional[str], int]], idempotency_key: Optional[str] = Header(None)):
+            deltas = {}
+            for key, delta in pairs:
+                if delta < 1:
+                    raise HTTPException(status_code=422, detail=f"Delta for key {key!r} must be >= 1, got {delta}")
+                deltas[key] = deltas.get(key, 0) + delta
+            response = {"status": "ok", "keys": len(deltas), "increments": sum(deltas.values())}
+            if await self._add_once(idempotency_key, lambda: self._add_batch(deltas)):
+                response["duplicate"] = True
+            return response
 
+        @self.app.post("/inc/{key}")
+        async def increment_key(key: str, by: int = Query(1, ge=1), idempotency_key: Optional[str] = Header(None)):
+            self._require_keyed()
+            if await self._add_once(idempotency_key, lambda: self._add_keyed(key, by)):
+                return {"status": "ok", "duplicate": True}
             return {"status": "ok"}
 
+        if self.storage_method == "postgresql":
+            @self.app.get("/pool/stats")
+            async def pool_stats():
+                # Per worker: each uvicorn worker has its own pool.
+                return self._pg_pool.stats()
+
+            @self.app.on_event("startup")
+            async def open_pg_pool():
+                if self._pg_async_pool is not None:
+                    await self._pg_async_pool.open()
+
+            @self.app.on_event("shutdown")
+            async def close_pg_pool():
+                if self._pg_async_pool is not None:
+                    await self._pg_async_pool.close()
+                else:
+                    self._pg_pool.close()
+
+        if self._executor is not None:
+            @self.app.on_event("shutdown")
+            def shutdown_executor():
+                self._executor.shutdown(wait=False)
+
         @self.app.get("/count")
         async def get_count():
             count = await self._read_value()
             return WebCounterResponse(count=count)
+
+        @self.app.get("/count/{key}")
+        async def get_count_key(key: str):
+            self._require_keyed()
+            count = await self._read_keyed(key)
+            return WebCounterResponse(count=count)
     
     def run(self):
         workers = int(os.getenv('WORKERS', '1'))
@@ -495,7 +1252,8 @@ class WebCounter:
                 host=self.host, 
                 port=self.port,
                 workers=workers,
-                loop="asyncio"
+                loop="asyncio",
+                access_log=False
             )
         else:
             logger.info("Starting uvicorn with single worker (async support enabled)")
@@ -503,12 +1261,13 @@ class WebCounter:
                 "web_counter:app",
                 host=self.host, 
                 port=self.port,
-                loop="asyncio"
+                loop="asyncio",
+                access_log=False
             )
 
 
 counter = get_counter_instance()
-app = counter.app
+app = counter.asgi_app
 
 if __name__ == "__main__":
     counter.run()
\ No newline at end of file
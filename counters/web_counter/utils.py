@@ -1,61 +1,626 @@
+import asyncio
+import json
+import socket
+import struct
+import logging
+import select
+import threading
 import time
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-def _session_with_retries(timeout=30, retries=3):
-    session = requests.Session()
-    retry = Retry(
-        total=retries,
-        backoff_factor=0.5,
-        status_forcelist=(502, 503, 504),
-        allowed_methods=["GET", "POST"],
-    )
-    session.mount("http://", HTTPAdapter(max_retries=retry))
-    return session
+import uuid
+from collections import Counter, deque
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+def _key_path(key):
+    return quote(str(key), safe="")
+
+def batch_payload(keys_chunk):
+    """Request for one increment per entry of `keys_chunk`: (method, path, JSON body or None).
+
+    A chunk of only the default key becomes POST /inc?by=n, anything else a
+    POST /inc/batch with one [key, delta] pair per distinct key.
+    """
+    deltas = Counter(keys_chunk)
+    if list(deltas) == [None]:
+        return "POST", f"/inc?by={deltas[None]}", None
+    return "POST", "/inc/batch", [[key, delta] for key, delta in deltas.items()]
+
+def _readable(sock, timeout):
+    # poll, unlike select, works for descriptors of 1024 and above.
+    poller = select.poll()
+    poller.register(sock, select.POLLIN)
+    return bool(poller.poll(timeout * 1000))
+
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        # One entry per unread response: True for a pipelined request whose
+        # outcome flush reports, False for the slower copy of a hedged request.
+        self.in_flight = deque()
+        self.reused = False
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 client with one persistent connection per calling thread.
+
+    Every tester client runs on its own thread, so each logical client owns a
+    connection and nothing is shared on the request path. With `pipeline_depth`
+    above 1, `send` writes a request and returns right away while fewer than
+    `pipeline_depth` responses are outstanding on the connection; otherwise it
+    first reads the oldest response and returns its status. `flush` reads the
+    rest. `hedged_request` uses a second connection of the thread for the
+    duplicate. `wait_ns_total` is the time calls spent getting a connection,
+    which is connecting here since nothing waits for a free one.
+    """
+
+    def __init__(self, host, port, pipeline_depth=1, timeout=60):
+        if pipeline_depth < 1:
+            raise ValueError(f"Invalid pipeline depth: {pipeline_depth}")
+        self.host = host
+        self.port = port
+        self.pipeline_depth = pipeline_depth
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sockets = []
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.wait_ns_total = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def _connections(self):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
+
+    def _connection(self, slot="primary"):
+        connections = self._connections()
+        conn = connections.get(slot)
+        if conn is None:
+            started = time.perf_counter_ns()
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = connections[slot] = _Connection(sock)
+            with self._lock:
+                self._sockets.append(sock)
+                self.connects += 1
+                self.wait_ns_total += time.perf_counter_ns() - started
+        return conn
+
+    def _drop(self, conn):
+        connections = self._connections()
+        for slot, existing in list(connections.items()):
+            if existing is conn:
+                del connections[slot]
+        conn.sock.close()
+
+    def _encode(self, method, path, body, request_id=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        content_type = "Content-Type: application/json\r\n" if payload else ""
+        idempotency_key = f"Idempotency-Key: {request_id}\r\n" if request_id else ""
+        return (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"{content_type}{idempotency_key}Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+            + payload
+        )
+
+    def request(self, method, path, body=None, request_id=None):
+        """Sends a request and waits for its response: (status, body)."""
+        self.flush()
+        conn = self._connection()
+        if conn.reused and _readable(conn.sock, 0):
+            # An idle keep-alive connection has nothing to read until the
+            # server closes it: reconnect before sending anything.
+            self._drop(conn)
+            conn = self._connection()
+        try:
+            conn.sock.sendall(self._encode(method, path, body, request_id))
+            status, response_body, keep_alive = read_http_response_sync(conn.reader)
+        except (ConnectionError, socket.timeout) as e:
+            self._drop(conn)
+            if not conn.reused or isinstance(e, socket.timeout):
+                raise
+            # The server closed the connection after the check above. It may
+            # have applied the request first, so only a request that is safe
+            # to apply twice is sent again on a new connection.
+            if method != "GET" and request_id is None:
+                raise
+            return self.request(method, path, body, request_id)
+        conn.reused = True
+        if not keep_alive:
+            self._drop(conn)
+        return status, response_body
+
+    def send(self, method, path, body=None):
+        """Pipelined request: the status of the oldest outstanding response once the pipeline is full, else None."""
+        if self.pipeline_depth == 1:
+            return self.request(method, path, body)[0]
+        conn = self._connection()
+        self._write(conn, self._encode(method, path, body), True)
+        if len(conn.in_flight) < self.pipeline_depth:
+            return None
+        return self._read_one(conn)
+
+    def hedged_request(self, method, path, body, hedge_after):
+        """Sends an increment with an idempotency key, and again on a second connection if
+        no response came within `hedge_after` seconds. Returns the status of the first
+        response that is not a 409, which the server answers while the other copy is
+        being applied. The slower response is read before the connection is used again.
+        """
+        self.flush()
+        request = self._encode(method, path, body, uuid.uuid4().hex)
+        primary = self._connection()
+        self._write(primary, request, False)
+        if _readable(primary.sock, hedge_after):
+            return self._read_one(primary)
+        self.hedges += 1
+        hedge = self._connection("hedge")
+        self._write(hedge, request, False)
+        pending = {primary.sock.fileno(): primary, hedge.sock.fileno(): hedge}
+        poller = select.poll()
+        for fd in pending:
+            poller.register(fd, select.POLLIN)
+        status = None
+        while pending:
+            ready = poller.poll(self.timeout * 1000)
+            if not ready:
+                raise socket.timeout(f"No response to {method} {path} within {self.timeout}s")
+            fd = ready[0][0]
+            poller.unregister(fd)
+            conn = pending.pop(fd)
+            status = self._read_one(conn)
+            if status != 409:
+                if conn is hedge:
+                    self.hedges_won += 1
+                return status
+        return status
+
+    def _write(self, conn, request, reported):
+        try:
+            conn.sock.sendall(request)
+        except OSError:
+            self._drop(conn)
+            raise
+        conn.in_flight.append(reported)
+        conn.reused = True
+
+    def _read_one(self, conn):
+        conn.in_flight.popleft()
+        try:
+            status, _, keep_alive = read_http_response_sync(conn.reader)
+        except OSError:
+            lost = len(conn.in_flight) + 1
+            conn.in_flight.clear()
+            self._drop(conn)
+            raise ConnectionError(f"Connection lost with {lost} requests unanswered")
+        if not keep_alive:
+            # Anything sent after this response will not be answered.
+            if conn.in_flight:
+                logger.warning(f"Server closed the connection with {len(conn.in_flight)} pipelined requests unanswered")
+                conn.in_flight.clear()
+            self._drop(conn)
+        return status
+
+    def flush(self):
+        """Reads the outstanding responses of this thread's connections; returns the pipelined ones' statuses."""
+        statuses = []
+        for conn in list(self._connections().values()):
+            while conn.in_flight:
+                reported = conn.in_flight[0]
+                status = self._read_one(conn)
+                if reported:
+                    statuses.append(status)
+        return statuses
+
+    def stats(self):
+        stats = {"connections": self.connects, "wait_ms_total": self.wait_ns_total / 1e6}
+        if self.hedges:
+            stats.update(hedges=self.hedges, hedges_won=self.hedges_won)
+        return stats
+
+    def close(self):
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            sock.close()
+
+
+def read_http_response_sync(reader):
+    status_line = reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split(b" ", 2)[1])
+    content_length = 0
+    chunked = False
+    keep_alive = True
+    while True:
+        line = reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        value = value.strip().lower()
+        if name == b"content-length":
+            content_length = int(value)
+        elif name == b"transfer-encoding" and value == b"chunked":
+            chunked = True
+        elif name == b"connection" and value == b"close":
+            keep_alive = False
+    if not chunked:
+        return status, reader.read(content_length) if content_length else b"", keep_alive
+    chunks = []
+    while True:
+        size = int(reader.readline().split(b";", 1)[0], 16)
+        if size == 0:
+            reader.readline()
+            break
+        chunks.append(reader.read(size))
+        reader.readline()
+    return status, b"".join(chunks), keep_alive
+
 
 def get_functions():
+    def _new_client(params):
+        return HttpClient(
+            params.get("counter_host", "localhost"),
+            params.get("counter_port", 8080),
+            pipeline_depth=params.get("pipeline_depth", 1),
+        )
+
+    def _increment(params, method, path, body=None):
+        client = _client(params)
+        hedge_after_ms = params.get("hedge_after_ms")
+        if hedge_after_ms:
+            return client.hedged_request(method, path, body, hedge_after_ms / 1000.0) == 200
+        status = client.send(method, path, body)
+        return status is None or status == 200
+
     def setup(params):
-        params["_web_session"] = _session_with_retries()
+        params["_web_client"] = _new_client(params)
         return None
 
     def shutdown(params):
-        s = params.pop("_web_session", None)
-        if s is not None:
-            s.close()
+        client = params.pop("_web_client", None)
+        if client is not None:
+            logger.info(f"Web client: {client.stats()}")
+            client.close()
+
+    def _client(params):
+        return params.get("_web_client") or _new_client(params)
 
-    def _base_url(params):
-        host = params.get("counter_host", "localhost")
-        port = params.get("counter_port", 8080)
-        return f"http://{host}:{port}"
+    def _checked(status, body, what):
+        if status != 200:
+            raise RuntimeError(f"{what} returned HTTP {status}: {body[:200]!r}")
+        return body
 
     def reset(params):
-        session = params.get("_web_session") or _session_with_retries()
-        r = session.post(f"{_base_url(params)}/reset", timeout=30)
-        r.raise_for_status()
-        return r
-
-    def count(params):
-        session = params.get("_web_session") or _session_with_retries()
-        r = session.get(f"{_base_url(params)}/count", timeout=10)
-        r.raise_for_status()
-        return r.json()["count"]
-
-    def increment(params):
-        import time
-        session = params.get("_web_session") or _session_with_retries()
-        last_error = None
-        for attempt in range(4):
+        keys = params.get("keys")
+        status, body = _client(params).request("POST", "/reset", {"keys": keys} if keys else None)
+        _checked(status, body, "POST /reset")
+
+    def count(params, key=None):
+        if key is None and params.get("keys"):
+            return sum(count(params, k) for k in params["keys"])
+        path = "/count" if key is None else f"/count/{_key_path(key)}"
+        status, body = _client(params).request("GET", path)
+        return json.loads(_checked(status, body, f"GET {path}"))["count"]
+
+    # With pipelining, an increment reports the outcome of the oldest outstanding
+    # request, and True while the pipeline is still filling; flush reports the rest.
+    def increment(params, key=None):
+        return _increment(params, "POST", "/inc" if key is None else f"/inc/{_key_path(key)}")
+
+    def increment_batch(params, keys_chunk):
+        return _increment(params, *batch_payload(keys_chunk))
+
+    def flush(params):
+        return sum(1 for status in _client(params).flush() if status != 200)
+
+    return {
+        "setup": setup,
+        "shutdown": shutdown,
+        "reset": reset,
+        "count": count,
+        "increment": increment,
+        "increment_batch": increment_batch,
+        "flush": flush,
+    }
+
+
+class AsyncConnectionPool:
+    def __init__(self, host, port, size=100, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.connects = 0
+        self.waits = 0
+        self.wait_ns_total = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    async def _acquire(self):
+        if self._idle:
+            return self._idle.pop()
+        self.connects += 1
+        return await asyncio.open_connection(self.host, self.port)
+
+    def _release(self, conn, keep_alive):
+        if keep_alive:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def request(self, method, path, body=b"", request_id=None):
+        # Pool wait: time until a connection is free (more clients than
+        # connections) plus the time to open one when none is idle.
+        started = time.perf_counter_ns()
+        if self._slots.locked():
+            self.waits += 1
+        async with self._slots:
+            conn = await self._acquire()
+            self.wait_ns_total += time.perf_counter_ns() - started
             try:
-                r = session.post(f"{_base_url(params)}/inc", timeout=60)
-                return r.status_code == 200
-            except requests.exceptions.ConnectionError as e:
-                last_error = e
-                if attempt < 3:
-                    time.sleep(0.2 * (attempt + 1))
-                else:
-                    raise
-        raise last_error
+                status, body, keep_alive = await asyncio.wait_for(
+                    self._exchange(conn, method, path, body, request_id), self.timeout
+                )
+            except BaseException:
+                conn[1].close()
+                raise
+            self._release(conn, keep_alive)
+            return status, body
+
+    async def hedged_request(self, method, path, body, hedge_after):
+        """Like HttpClient.hedged_request: a second copy after `hedge_after` seconds, first non-409 wins."""
+        request_id = uuid.uuid4().hex
+        first = asyncio.ensure_future(self.request(method, path, body, request_id))
+        pending = (await asyncio.wait([first], timeout=hedge_after))[1]
+        hedge = None
+        if pending:
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self.request(method, path, body, request_id))
+            pending.add(hedge)
+        status, error = None, None
+        for task in (first, hedge):
+            if task is not None:
+                # The loser keeps running until its response is read, so that
+                # its connection goes back to the pool; its outcome is dropped.
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        while True:
+            if first.done() and not pending:
+                done = {first}
+            else:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                status = task.result()[0]
+                if status != 409:
+                    if task is hedge:
+                        self.hedges_won += 1
+                    return status
+            if not pending:
+                if status is None:
+                    raise error
+                return status
+
+    async def _exchange(self, conn, method, path, body=b"", request_id=None):
+        reader, writer = conn
+        content_type = "Content-Type: application/json\r\n" if body else ""
+        idempotency_key = f"Idempotency-Key: {request_id}\r\n" if request_id else ""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"{content_type}{idempotency_key}Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+        return await read_http_response(reader)
+
+    def stats(self):
+        stats = {"connections": self.connects, "waits": self.waits, "wait_ms_total": self.wait_ns_total / 1e6}
+        if self.hedges:
+            stats.update(hedges=self.hedges, hedges_won=self.hedges_won)
+        return stats
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+
+async def read_http_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split(b" ", 2)[1])
+    content_length = 0
+    chunked = False
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        value = value.strip().lower()
+        if name == b"content-length":
+            content_length = int(value)
+        elif name == b"transfer-encoding" and value == b"chunked":
+            chunked = True
+        elif name == b"connection" and value == b"close":
+            keep_alive = False
+    if not chunked:
+        body = await reader.readexactly(content_length) if content_length else b""
+        return status, body, keep_alive
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b";", 1)[0], 16)
+        if size == 0:
+            await reader.readline()
+            break
+        chunks.append(await reader.readexactly(size))
+        await reader.readline()
+    return status, b"".join(chunks), keep_alive
+
+
+def get_async_functions():
+    async def setup(params):
+        params["_async_web_pool"] = AsyncConnectionPool(
+            params.get("counter_host", "localhost"),
+            params.get("counter_port", 8080),
+            size=params.get("connections", 100),
+        )
+        return None
+
+    async def shutdown(params):
+        pool = params.pop("_async_web_pool", None)
+        if pool is not None:
+            logger.info(f"Web client pool: {pool.stats()}")
+            await pool.close()
+
+    async def _increment(params, method, path, payload=b""):
+        pool = params["_async_web_pool"]
+        hedge_after_ms = params.get("hedge_after_ms")
+        if hedge_after_ms:
+            return await pool.hedged_request(method, path, payload, hedge_after_ms / 1000.0) == 200
+        status, _ = await pool.request(method, path, payload)
+        return status == 200
+
+    async def increment(params, key=None):
+        return await _increment(params, "POST", "/inc" if key is None else f"/inc/{_key_path(key)}")
+
+    async def increment_batch(params, keys_chunk):
+        method, path, body = batch_payload(keys_chunk)
+        return await _increment(params, method, path, json.dumps(body).encode() if body is not None else b"")
+
+    async def count(params, key=None):
+        path = "/count" if key is None else f"/count/{_key_path(key)}"
+        status, body = await params["_async_web_pool"].request("GET", path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned HTTP {status}")
+        return json.loads(body)["count"]
+
+    return {
+        "setup": setup,
+        "shutdown": shutdown,
+        "count": count,
+        "increment": increment,
+        "increment_batch": increment_batch,
+    }
+
+
+# Binary protocol (web_counter/api/binary_protocol.py), big-endian frames:
+#   request: u32 length | u8 op | i64 argument | key (UTF-8, empty = default counter)
+#   reply:   u32 length | u16 status | i64 value | error message
+_LENGTH = struct.Struct(">I")
+_REQUEST = struct.Struct(">Bq")
+_REPLY = struct.Struct(">Hq")
+OP_INC = 1
+OP_GET = 2
+OP_RESET = 3
+
+
+def encode_request(op, argument=0, key=None):
+    payload = b"" if key is None else str(key).encode()
+    return _LENGTH.pack(_REQUEST.size + len(payload)) + _REQUEST.pack(op, argument) + payload
+
+def batch_frames(keys_chunk):
+    """One pipelined INC per distinct key of `keys_chunk`, carrying its number of increments."""
+    return [encode_request(OP_INC, delta, key) for key, delta in Counter(keys_chunk).items()]
+
+def _decode_reply(frame):
+    status, value = _REPLY.unpack_from(frame)
+    return status, value, frame[_REPLY.size:].decode()
+
+
+class BinaryClient:
+    """Blocking binary protocol client with one connection per calling thread."""
+
+    def __init__(self, host, port, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sockets = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+            with self._lock:
+                self._sockets.append(sock)
+        return conn
+
+    def call(self, frames):
+        """Sends the frames in one write and returns their (status, value, message) replies in order."""
+        sock, reader = self._connection()
+        try:
+            sock.sendall(b"".join(frames))
+            replies = []
+            for _ in frames:
+                header = reader.read(_LENGTH.size)
+                if len(header) < _LENGTH.size:
+                    raise ConnectionError("Connection closed by server")
+                (length,) = _LENGTH.unpack(header)
+                replies.append(_decode_reply(reader.read(length)))
+            return replies
+        except OSError:
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def close(self):
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            sock.close()
+
+
+def _check_reply(reply, what):
+    status, value, message = reply
+    if status != 200:
+        raise RuntimeError(f"{what} returned status {status}: {message}")
+    return value
+
+def get_binary_functions():
+    def setup(params):
+        params["_binary_client"] = BinaryClient(params.get("counter_host", "localhost"), params.get("counter_port", 9090))
+        return None
+
+    def shutdown(params):
+        client = params.pop("_binary_client", None)
+        if client is not None:
+            client.close()
+
+    def _client(params):
+        return params.get("_binary_client") or BinaryClient(params.get("counter_host", "localhost"), params.get("counter_port", 9090))
+
+    def reset(params):
+        # RESET of the empty key resets the default counter, as /reset does.
+        frames = [encode_request(OP_RESET)] + [encode_request(OP_RESET, 0, key) for key in params.get("keys") or ()]
+        for reply in _client(params).call(frames):
+            _check_reply(reply, "RESET")
+
+    def count(params, key=None):
+        if key is None and params.get("keys"):
+            frames = [encode_request(OP_GET, 0, k) for k in params["keys"]]
+            return sum(_check_reply(reply, "GET") for reply in _client(params).call(frames))
+        return _check_reply(_client(params).call([encode_request(OP_GET, 0, key)])[0], "GET")
+
+    def increment(params, key=None):
+        return _client(params).call([encode_request(OP_INC, 1, key)])[0][0] == 200
+
+    def increment_batch(params, keys_chunk):
+        return all(reply[0] == 200 for reply in _client(params).call(batch_frames(keys_chunk)))
 
     return {
         "setup": setup,
@@ -63,4 +628,80 @@ def get_functions():
         "reset": reset,
         "count": count,
         "increment": increment,
+        "increment_batch": increment_batch,
+    }
+
+
+class AsyncBinaryPool:
+    """Binary protocol connections shared by the coroutines of the asyncio engine."""
+
+    def __init__(self, host, port, size=100, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def call(self, frames):
+        async with self._slots:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                replies = await asyncio.wait_for(self._exchange(reader, writer, frames), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            self._idle.append((reader, writer))
+            return replies
+
+    @staticmethod
+    async def _exchange(reader, writer, frames):
+        writer.write(b"".join(frames))
+        await writer.drain()
+        replies = []
+        for _ in frames:
+            (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+            replies.append(_decode_reply(await reader.readexactly(length)))
+        return replies
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+
+def get_async_binary_functions():
+    async def setup(params):
+        params["_async_binary_pool"] = AsyncBinaryPool(
+            params.get("counter_host", "localhost"),
+            params.get("counter_port", 9090),
+            size=params.get("connections", 100),
+        )
+        return None
+
+    async def shutdown(params):
+        pool = params.pop("_async_binary_pool", None)
+        if pool is not None:
+            await pool.close()
+
+    async def increment(params, key=None):
+        replies = await params["_async_binary_pool"].call([encode_request(OP_INC, 1, key)])
+        return replies[0][0] == 200
+
+    async def increment_batch(params, keys_chunk):
+        replies = await params["_async_binary_pool"].call(batch_frames(keys_chunk))
+        return all(reply[0] == 200 for reply in replies)
+
+    async def count(params, key=None):
+        replies = await params["_async_binary_pool"].call([encode_request(OP_GET, 0, key)])
+        return _check_reply(replies[0], "GET")
+
+    return {
+        "setup": setup,
+        "shutdown": shutdown,
+        "count": count,
+        "increment": increment,
+        "increment_batch": increment_batch,
     }